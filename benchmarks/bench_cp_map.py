@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+'''
+    File name: bench_cp_map.py
+    Author: Emil Zhai
+    Python Version: 3.7
+
+    Measure the startup cost of the cp_map code point mapping tables:
+    building all four presets eagerly (what importing cp_map used to do),
+    importing cp_map, and loading one preset with and without the compiled
+    mapping file. Every measurement runs in a fresh interpreter on a copy of
+    cp_map.py, so the compiled file of the working tree is left alone.
+'''
+
+import argparse, glob, json, os, py_compile, shutil, subprocess, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = '''
+import json, sys, time, tracemalloc
+sys.path.insert(0, %(path)r)
+tracemalloc.start()
+start = time.perf_counter()
+import cp_map
+%(code)s
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'memory': tracemalloc.get_traced_memory()[0]}))
+'''
+
+CASES = [
+  ('import, eager build (previous)', 'mappings = cp_map.BuildMappings()', False),
+  ('import only', '', False),
+  ('import, one preset', 'len(cp_map.Hans2Hant)', False),
+  ('import, one preset, compiling', 'len(cp_map.Hans2Hant)', True),
+]
+
+def measure(path, code, cold, repeat):
+  results = []
+  for i in range(repeat):
+    if cold:
+      for compiled in glob.glob(os.path.join(path, '__pycache__', 'cp_map.*.bin')):
+        os.remove(compiled)
+    output = subprocess.check_output([sys.executable, '-c', MEASURE % {'path': path, 'code': code}])
+    results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+  return min(r['seconds'] for r in results), max(r['memory'] for r in results)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmark loading the cp_map code point mapping tables.')
+  parser.add_argument('-n', '--repeat', type=int, default=5, help='runs per case, the fastest one is reported (default: %(default)s)')
+  parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file', default=None)
+  args = parser.parse_args()
+
+  path = tempfile.mkdtemp()
+  try:
+    shutil.copy(os.path.join(ROOT, 'cp_map.py'), path)
+    py_compile.compile(os.path.join(path, 'cp_map.py'))
+    # compile the mapping file once for the warm cases
+    subprocess.check_call([sys.executable, '-c', MEASURE % {'path': path, 'code': 'len(cp_map.Hans)'}], stdout=subprocess.DEVNULL)
+    results = {}
+    print('%-32s %10s %12s' % ('case', 'time (ms)', 'memory (KB)'))
+    for name, code, cold in CASES:
+      seconds, memory = measure(path, code, cold, args.repeat)
+      results[name] = {'seconds': seconds, 'memory': memory}
+      print('%-32s %10.2f %12.1f' % (name, seconds * 1000, memory / 1024.0))
+  finally:
+    shutil.rmtree(path, ignore_errors=True)
+
+  if args.json_path:
+    with open(args.json_path, 'w') as f:
+      json.dump(results, f, indent=2)
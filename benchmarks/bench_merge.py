@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+'''
+    File name: bench_merge.py
+    Author: Emil Zhai
+    Python Version: 3.7
+
+    Benchmark the merge pipeline on synthetic fonts from synth_font.py: every
+    font size and format is merged into itself with each PRESET_MAP entry and
+    each merge backend. Every case runs in a fresh interpreter and records the
+    output size plus the wall time and peak RSS of each phase reported by the
+    MergeStats of convert_font, e.g. decompile, parse, index, merge, optimize,
+    write and compile for the ttx backends.
+
+    Peak RSS is the peak of the process during the phase, or of the largest ttx
+    child process for decompile and compile. It is reset for every phase on
+    Linux, elsewhere phases that do not raise the peak of the case report none.
+    With --baseline, the run fails when a phase takes more time or memory, or
+    the output is bigger, than in the baseline by more than --threshold percent.
+'''
+
+import argparse, importlib.util, json, os, platform, shutil, subprocess, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, ROOT)
+from merge_stats import MergeStats
+
+BACKENDS = ['ttfont', 'xml', 'stream']
+# phases below this many seconds are too noisy to fail a run
+MIN_SECONDS = 0.05
+
+def load_font_conv():
+  spec = importlib.util.spec_from_file_location('font_conv', os.path.join(ROOT, 'font-conv.py'))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def run_case(font_file, preset, backend, work_dir, overwrite, optimize):
+  # run one case in this process, the fonts are written to work_dir
+  fc = load_font_conv()
+  font_ext = os.path.splitext(font_file)[1]
+  base_file = os.path.join(work_dir, 'base' + font_ext)
+  shutil.copy(font_file, base_file)
+  out_file = os.path.join(work_dir, 'out' + font_ext)
+  stats = MergeStats()
+  ttx_file = base_binary = None
+  if backend != 'ttfont':
+    stats.begin('decompile', children=True)
+    ttx_file = fc.decompile_font(base_file, quiet=True, tables=fc.MERGED_TABLES)
+    stats.end()
+    base_binary = base_file
+  fc.convert_font(ttx_file or base_file, ttx_file or base_file, preset, out_file, '4,12', overwrite, optimize, backend == 'ttfont',
+                  backend == 'stream', verbose=False, stats=stats, base_binary=base_binary)
+  result = stats.to_dict()
+  result['size'] = os.path.getsize(out_file)
+  return result
+
+def run_case_process(font_file, preset, backend, overwrite, optimize):
+  work_dir = tempfile.mkdtemp()
+  try:
+    args = [sys.executable, os.path.abspath(__file__), '--run-case', json.dumps([font_file, preset, backend, work_dir, overwrite, optimize])]
+    output = subprocess.check_output(args)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+  finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+def get_fonts(font_dir, sizes, formats):
+  import synth_font
+  fonts = []
+  for size in sizes:
+    for font_format in formats:
+      path = os.path.join(font_dir, 'synth-%d.%s' % (size, font_format))
+      if not os.path.exists(path):
+        print('Generating %s...' % path)
+        synth_font.build_font(path, size, cff=font_format == 'otf')
+      fonts.append(('%s-%d' % (font_format, size), path))
+  return fonts
+
+def find_regressions(results, baseline, threshold):
+  regressions = []
+  for case, result in results.items():
+    if case not in baseline:
+      continue
+    checks = [('output', 'size', result['size'], baseline[case].get('size'))]
+    for phase, stats in result['phases'].items():
+      old = baseline[case]['phases'].get(phase, {})
+      if stats['seconds'] >= MIN_SECONDS:
+        checks.append((phase, 'seconds', stats['seconds'], old.get('seconds')))
+      checks.append((phase, 'peak_rss', stats['peak_rss'], old.get('peak_rss')))
+    for phase, key, new, old in checks:
+      if new is None or not old:
+        continue
+      change = (new - old) * 100.0 / old
+      if change > threshold:
+        regressions.append((case, phase, key, old, new, change))
+  return regressions
+
+def format_size(value):
+  return '-' if value is None else '%.1f' % (value / (1024.0 * 1024.0))
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmark the merge pipeline on synthetic fonts.')
+  parser.add_argument('--sizes', default='1000,10000', help='comma separated glyph counts, up to 60000 (default: %(default)s)')
+  parser.add_argument('--formats', default='ttf,otf', help='comma separated font formats, ttf and/or otf (default: %(default)s)')
+  parser.add_argument('--presets', default=None, help='comma separated PRESET_MAP entries (default: all)')
+  parser.add_argument('--backends', default=','.join(BACKENDS), help='comma separated merge backends (default: %(default)s)')
+  parser.add_argument('--overwrite', action='store_true', help='merge with --overwrite')
+  parser.add_argument('--no-optimize', action='store_true', help='merge without --optimize')
+  parser.add_argument('--font-dir', default=None, help='keep the generated fonts in this directory and reuse them (default: a temporary directory)')
+  parser.add_argument('--json', dest='json_path', help='write the results to this JSON file', default=None)
+  parser.add_argument('--baseline', default=None, help='JSON results of an earlier run to compare with')
+  parser.add_argument('--threshold', type=float, default=10.0, help='fail when a phase takes more time or memory, or the output is bigger, than in the baseline by more than this many percent (default: %(default)s)')
+  parser.add_argument('--run-case', default=None, help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.run_case:
+    print(json.dumps(run_case(*json.loads(args.run_case))))
+    exit(0)
+
+  baseline = None
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)['results']
+
+  fc = load_font_conv()
+  presets = args.presets.split(',') if args.presets else list(fc.PRESET_MAP)
+  backends = args.backends.split(',')
+  font_dir = args.font_dir or tempfile.mkdtemp()
+  if not os.path.isdir(font_dir):
+    os.makedirs(font_dir)
+  try:
+    fonts = get_fonts(font_dir, [int(s) for s in args.sizes.split(',')], args.formats.split(','))
+    results = {}
+    print('%-36s %-10s %10s %14s %12s' % ('case', 'phase', 'time (s)', 'peak RSS (MB)', 'size (MB)'))
+    for font_name, font_file in fonts:
+      for preset in presets:
+        for backend in backends:
+          case = '%s/%s/%s' % (font_name, preset, backend)
+          result = run_case_process(font_file, preset, backend, args.overwrite, not args.no_optimize)
+          results[case] = result
+          for phase, stats in result['phases'].items():
+            print('%-36s %-10s %10.3f %14s %12s' % (case, phase, stats['seconds'], format_size(stats['peak_rss']), ''))
+          print('%-36s %-10s %10s %14s %12s' % (case, 'output', '', '', format_size(result['size'])))
+  finally:
+    if args.font_dir is None:
+      shutil.rmtree(font_dir, ignore_errors=True)
+
+  if args.json_path:
+    import fontTools
+    with open(args.json_path, 'w') as f:
+      json.dump({
+        'meta': {
+          'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+          'python': platform.python_version(),
+          'fonttools': fontTools.version,
+          'platform': platform.platform(),
+          'overwrite': args.overwrite,
+          'optimize': not args.no_optimize,
+        },
+        'results': results,
+      }, f, indent=2, sort_keys=True)
+
+  if baseline is not None:
+    regressions = find_regressions(results, baseline, args.threshold)
+    print('--------------------------------------------------')
+    for case, phase, key, old, new, change in regressions:
+      print('REGRESSION %s %s %s: %.6g -> %.6g (%+.1f%%)' % (case, phase, key, old, new, change))
+    print('%d regressions over %.1f%% compared with %s' % (len(regressions), args.threshold, args.baseline))
+    if regressions:
+      exit(1)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+'''
+    File name: bench_xml_merge.py
+    Author: Emil Zhai
+    Python Version: 3.7
+
+    Time merge_font, the ttx XML merge, on a full-size synthetic CJK font from
+    synth_font.py with the working tree and with an earlier revision, by default
+    BASELINE_REF, the last one rescanning the cmap/hmtx/vmtx elements for every
+    mapped code point instead of indexing them once. The font is merged into itself with
+    Hans2Hant, --overwrite and --optimize. Every measurement runs in a fresh
+    interpreter on a copy of font-conv.py and cp_map.py.
+'''
+
+import argparse, json, os, shutil, subprocess, sys, tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# default --ref, the last revision without the indexed XML merge
+BASELINE_REF = '313db02abe1b838902873fac425cb09d4955012c'
+
+MEASURE = '''
+import importlib.util, json, sys, time
+sys.path.insert(0, %(path)r)
+spec = importlib.util.spec_from_file_location('font_conv', %(script)r)
+fc = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fc)
+cp_map = fc.PRESET_MAP['Hans2Hant']
+len(cp_map)
+start = time.perf_counter()
+fc.merge_font(%(ttx)r, %(ttx)r, cp_map, ['4', '12'], True, %(out)r, True)
+print(json.dumps({'seconds': time.perf_counter() - start}))
+'''
+
+def git(*args):
+  return subprocess.check_output(['git'] + list(args), cwd=ROOT, stderr=subprocess.DEVNULL)
+
+def get_default_ref():
+  try:
+    git('cat-file', '-e', BASELINE_REF + '^{commit}')
+  except subprocess.CalledProcessError:
+    raise RuntimeError('baseline revision %s is not in this repository, pass --ref' % BASELINE_REF[:10])
+  return BASELINE_REF[:10]
+
+def checkout(ref, path):
+  # copy font-conv.py and cp_map.py of ref, or of the working tree if ref is None
+  os.makedirs(path)
+  for name in ('font-conv.py', 'cp_map.py', 'font_cache.py', 'merge_stats.py'):
+    if ref is None:
+      if os.path.exists(os.path.join(ROOT, name)):
+        shutil.copy(os.path.join(ROOT, name), path)
+      continue
+    try:
+      data = git('show', '%s:%s' % (ref, name))
+    except subprocess.CalledProcessError:
+      continue  # not part of that revision yet
+    with open(os.path.join(path, name), 'wb') as f:
+      f.write(data)
+
+def measure(path, ttx_file, repeat):
+  results = []
+  for i in range(repeat):
+    code = MEASURE % {'path': path, 'script': os.path.join(path, 'font-conv.py'), 'ttx': ttx_file, 'out': os.path.join(path, 'out.ttx')}
+    output = subprocess.check_output([sys.executable, '-c', code])
+    results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1])['seconds'])
+  return min(results)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmark merge_font on a full-size CJK .ttx against an earlier revision.')
+  parser.add_argument('--glyphs', type=int, default=28000, help='number of glyphs of the synthetic font (default: %(default)s)')
+  parser.add_argument('--ref', default=None, help='git revision to compare with (default: %s, the last one without the indexed XML merge)' % BASELINE_REF[:10])
+  parser.add_argument('-n', '--repeat', type=int, default=1, help='runs per revision, the fastest one is reported (default: %(default)s)')
+  parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file', default=None)
+  args = parser.parse_args()
+
+  import synth_font
+  work_dir = tempfile.mkdtemp()
+  try:
+    font_file = synth_font.build_font(os.path.join(work_dir, 'synth.ttf'), args.glyphs)
+    ttx_file = os.path.join(work_dir, 'synth.ttx')
+    subprocess.check_call(['ttx', '-q', '-o', ttx_file, font_file])
+    ref = args.ref or get_default_ref()
+    results = {}
+    print('%-24s %10s' % ('revision', 'time (s)'))
+    for name, rev in ((ref, ref), ('working tree', None)):
+      path = os.path.join(work_dir, 'rev%d' % len(results))
+      checkout(rev, path)
+      results[name] = {'seconds': measure(path, ttx_file, args.repeat)}
+      print('%-24s %10.2f' % (name, results[name]['seconds']))
+  finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+  if args.json_path:
+    with open(args.json_path, 'w') as f:
+      json.dump({'glyphs': args.glyphs, 'results': results}, f, indent=2)
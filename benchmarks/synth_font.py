@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+'''
+    File name: synth_font.py
+    Author: Emil Zhai
+    Python Version: 3.7
+
+    Generate synthetic CJK fonts for benchmarking with fontTools' FontBuilder.
+    Simplified Chinese code points of the Hans preset are encoded first, so the
+    presets both replace and append glyphs, followed by the rest of the CJK
+    Unified Ideographs, Extension A and Extension B when more glyphs are needed.
+    TrueType fonts mix simple glyphs with composites built from a pool of
+    unencoded component glyphs, CFF fonts only have simple glyphs. Both get
+    horizontal and vertical metrics.
+'''
+
+import argparse, os, sys
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cp_map
+
+UPM = 1000
+MAX_GLYPHS = 60000
+
+CJK_RANGES = [(0x4e00, 0x9fff), (0x3400, 0x4dbf), (0x20000, 0x2a6df)]
+
+def get_code_points(count):
+  codes = sorted(cp_map.Hans)
+  seen = set(codes)
+  for first, last in CJK_RANGES:
+    for code in range(first, last + 1):
+      if len(codes) >= count:
+        return codes[:count]
+      if code not in seen:
+        codes.append(code)
+  return codes[:count]
+
+def draw_outline(pen, index):
+  # a few boxes whose size and position depend on index, so outlines differ
+  for box in range(1 + index % 3):
+    x = 50 + (index * 7 + box * 290) % 600
+    y = 50 + (index * 13 + box * 170) % 600
+    size = 100 + (index + box * 31) % 200
+    pen.moveTo((x, y))
+    pen.lineTo((x, y + size))
+    pen.lineTo((x + size, y + size))
+    pen.lineTo((x + size, y))
+    pen.closePath()
+
+def build_font(path, glyph_count, cff=False, composite_ratio=0.2, component_count=256, production_names=False):
+  # build a font with glyph_count glyphs including .notdef and the component glyphs
+  glyph_count = max(2, min(glyph_count, MAX_GLYPHS))
+  component_count = 0 if cff else min(component_count, glyph_count // 4)
+  codes = get_code_points(glyph_count - 1 - component_count)
+  names = []
+  for i, code in enumerate(codes):
+    if production_names:
+      names.append('cid%05d' % (i + 1))
+    else:
+      names.append('u%05X' % code if code > 0xffff else 'uni%04X' % code)
+  component_names = ['part%03d' % i for i in range(component_count)]
+  glyph_order = ['.notdef'] + names + component_names
+
+  fb = FontBuilder(UPM, isTTF=not cff)
+  fb.setupGlyphOrder(glyph_order)
+  fb.setupCharacterMap(dict(zip(codes, names)))
+  if cff:
+    char_strings = {}
+    for i, name in enumerate(glyph_order):
+      pen = T2CharStringPen(UPM, None)
+      draw_outline(pen, i)
+      char_strings[name] = pen.getCharString()
+    fb.setupCFF('SynthCJK-Regular', {'FullName': 'Synth CJK'}, char_strings, {})
+  else:
+    glyphs = {}
+    for i, name in enumerate(['.notdef'] + component_names):
+      pen = TTGlyphPen(None)
+      draw_outline(pen, i)
+      glyphs[name] = pen.glyph()
+    composite_every = int(round(1 / composite_ratio)) if composite_ratio and component_count else 0
+    for i, name in enumerate(names):
+      if composite_every and i % composite_every == 0:
+        pen = TTGlyphPen(glyphs)
+        pen.addComponent(component_names[i % component_count], (1, 0, 0, 1, 0, 0))
+        pen.addComponent(component_names[(i * 7 + 1) % component_count], (1, 0, 0, 1, 400, 0))
+      else:
+        pen = TTGlyphPen(None)
+        draw_outline(pen, i + component_count)
+      glyphs[name] = pen.glyph()
+    fb.setupGlyf(glyphs)
+
+  fb.setupHorizontalMetrics(dict((name, (UPM, 50)) for name in glyph_order))
+  fb.setupHorizontalHeader(ascent=880, descent=-120)
+  fb.setupVerticalMetrics(dict((name, (UPM, 120)) for name in glyph_order))
+  fb.setupVerticalHeader(ascent=500, descent=-500)
+  fb.setupNameTable({'familyName': 'Synth CJK', 'styleName': 'Regular'})
+  fb.setupOS2(sTypoAscender=880, sTypoDescender=-120, usWinAscent=880, usWinDescent=120)
+  fb.setupPost()
+  fb.save(path)
+  return path
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Generate a synthetic CJK font for benchmarks.')
+  parser.add_argument('output', help='path to the output font (.ttf or .otf)')
+  parser.add_argument('-n', '--glyphs', type=int, default=10000, help='number of glyphs, up to %d (default: %%(default)s)' % MAX_GLYPHS)
+  parser.add_argument('--cff', action='store_true', help='build CFF outlines (default for .otf outputs)')
+  parser.add_argument('--composites', type=float, default=0.2, help='share of encoded TrueType glyphs built from components (default: %(default)s)')
+  parser.add_argument('--production-names', action='store_true', help='name glyphs cidNNNNN instead of uniXXXX')
+  args = parser.parse_args()
+  cff = args.cff or os.path.splitext(args.output)[1].lower() == '.otf'
+  build_font(args.output, args.glyphs, cff, args.composites, production_names=args.production_names)
@@ -7,56 +7,269 @@
 '''
 
 import xml.etree.ElementTree as ET
-import copy, os, argparse
+from xml.sax.saxutils import escape, quoteattr
+import copy, os, argparse, hashlib, json, struct, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+import cp_map
 from cp_map import Hans, Hant, Hans2Hant, Hant2Hans
+from font_cache import FontCache, DEFAULT_CACHE_SIZE, file_hash
+from merge_stats import MergeStats, run_command
 
-MAX_CODE = 0xffff
+try:
+  from fontTools.ttLib import TTFont
+  from fontTools.ttLib.tables._g_l_y_f import Glyph
+  from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+except ImportError:
+  TTFont = None
 
-def find_child(node, tag, name):
-  for child in node.findall(tag):
-    if child.attrib['name'] == name:
-      return child
+MAX_BMP_CODE = 0xffff
+MAX_CODE = 0x10ffff
+# cmap formats able to hold code points above MAX_BMP_CODE
+FULL_RANGE_CMAP_FORMATS = ['12', '13']
+# platform and encoding IDs of the format 12 subtable added when there is none of them
+FULL_RANGE_CMAP_IDS = (3, 10)
+# tables a merge changes, directly or through fields recalculated when compiling them,
+# all other tables are copied from the input font as they are
+MERGED_TABLES = ['GlyphOrder', 'head', 'hhea', 'maxp', 'OS/2', 'post', 'cmap', 'loca', 'glyf', 'gvar', 'hmtx', 'vhea', 'vmtx']
+# tables with a record per glyph the merge does not update, dropped when it writes glyphs.
+# Without HVAR/VVAR the advance deltas come from the phantom points in gvar
+PER_GLYPH_TABLES = ['hdmx', 'LTSH', 'HVAR', 'VVAR']
+# tables compiled without glyf or the metrics, the ttx backends can compile them in a second
+# ttx process beside the others. Both get the shared tables, post needs the number of glyphs
+SPLIT_TABLES = ['OS/2', 'cmap', 'post']
+SPLIT_SHARED_TABLES = ['GlyphOrder', 'maxp']
+# sfnt versions of TrueType and CFF fonts, WOFF and font collections are not sfnt fonts
+SFNT_VERSIONS = (b'\0\1\0\0', b'OTTO', b'true')
 
-def replace_child(node, child):
-  c = find_child(node, child.tag, child.attrib['name'])
+def index_children(node, tag, key='name', convert=None):
+  # build a key -> element index once, so lookups do not rescan the table
+  index = {}
+  if node is not None:
+    for child in node.findall(tag):
+      value = child.attrib[key]
+      if convert is not None:
+        value = convert(value)
+      if value not in index:
+        index[value] = child
+  return index
+
+def replace_child(node, index, key, child):
+  c = index.get(key)
   if c is not None:
     c.attrib = copy.deepcopy(child.attrib)
   else:
     node.append(child)
+    index[key] = child
 
-def copy_child_to_node(node, tag, name, new_name, dst_node):
-  if node is None or dst_node is None:
+def copy_child_to_node(index, name, new_name, dst_node, dst_index):
+  if dst_node is None:
     return
-  c = find_child(node, tag, name)
+  c = index.get(name)
   if c is not None:
     c = copy.deepcopy(c)
     c.set('name', new_name)
-    replace_child(dst_node, c)
+    replace_child(dst_node, dst_index, new_name, c)
+
+def set_ttx_variations(gvar, gvar_index, name, variations):
+  # the variations of the glyph a copy replaces would not match its points, they are replaced
+  # by those of the source glyph, or left empty, which ttx compiles to no variations
+  if gvar is None:
+    return
+  node = gvar_index.get(name)
+  if node is None:
+    node = gvar_index[name] = ET.SubElement(gvar, 'glyphVariations', {'glyph': name})
+  node[:] = copy.deepcopy(list(variations)) if variations is not None else []
+
+def remove_children(node, tag, names):
+  node[:] = [c for c in node if c.tag != tag or c.attrib.get('name') not in names]
+
+def parse_code(code):
+  return int(code, 16)
+
+def code_from_glyph_name(name):
+  # code point of uniXXXX and uXXXX[X[X]] glyph names, None for other names
+  name = name.lower()
+  if name.startswith('uni'):
+    digits = name[3:]
+    if len(digits) != 4:
+      return None
+  elif name.startswith('u'):
+    digits = name[1:]
+    if not 4 <= len(digits) <= 6:
+      return None
+  else:
+    return None
+  try:
+    code = int(digits, 16)
+  except ValueError:
+    return None
+  return code if code <= MAX_CODE else None
+
+def glyph_name_for_code(code):
+  if code > MAX_BMP_CODE:
+    return 'u%05X' % code
+  return 'uni%04X' % code
+
+def cmap_accepts_code(cmap_format, code):
+  return code <= MAX_BMP_CODE or str(cmap_format) in FULL_RANGE_CMAP_FORMATS
+
+def get_full_range_cmap(cmap_formats, cmap_versions, merge_cp_map):
+  # returns (the largest code point the merge can map, whether it adds a format 12 subtable).
+  # Without a format 12/13 subtable one is added for the code points above U+FFFF if
+  # cmap_versions has format 12, their mappings are skipped otherwise
+  if any(str(f) in FULL_RANGE_CMAP_FORMATS for f in cmap_formats):
+    return MAX_CODE, False
+  if not any(MAX_BMP_CODE < code <= MAX_CODE for code in merge_cp_map.values()):
+    return MAX_CODE, False
+  if '12' in [str(v) for v in cmap_versions]:
+    return MAX_CODE, True
+  print('warning: no cmap format %s subtable to map code points above U+FFFF, they are skipped' % '/'.join(FULL_RANGE_CMAP_FORMATS))
+  return MAX_BMP_CODE, False
+
+def find_bmp_cmap(cmap_ids):
+  # index of the Unicode subtable an added format 12 subtable starts from, or None
+  for i, ids in enumerate(cmap_ids):
+    if ids == (3, 1):
+      return i
+  for i, ids in enumerate(cmap_ids):
+    if ids[0] == 0:
+      return i
+  return None
+
+def new_ttx_full_range_cmap():
+  # length and nGroups are recalculated when compiling
+  return ET.Element('cmap_format_12', {'platformID': str(FULL_RANGE_CMAP_IDS[0]), 'platEncID': str(FULL_RANGE_CMAP_IDS[1]),
+                                       'format': '12', 'reserved': '0', 'length': '0', 'language': '0', 'nGroups': '0'})
+
+def build_ttx_cmap_dict(cmap):
+  cmap_dict = {}
+  for cmap_table in cmap.findall('*'):
+    if cmap_table.tag.startswith('cmap_format_'):
+      for map_entry in cmap_table.findall('map'):
+        if 'code' in map_entry.attrib:
+          cmap_dict[parse_code(map_entry.attrib['code'])] = map_entry.attrib['name']
+  return cmap_dict
 
-def remove_child(node, tag, name):
-  for c in node.findall(tag):
-    if c.attrib['name'] == name:
-      node.remove(c)
+def find_glyph_name(code, cmap_dict, glyph_names):
+  # the cmap decides which glyph a code point shows, glyphs missing
+  # from it are still found by their uniXXXX/uXXXXX name
+  name = cmap_dict.get(code)
+  if name is None or name not in glyph_names:
+    name = glyph_name_for_code(code)
+    if name not in glyph_names:
+      return None
+  return name
 
-def merge_font(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exist, out_file, optimize_size):
+def count_glyph_codes(cmap_dict):
+  # glyph name -> number of code points the cmap maps to it
+  code_counts = {}
+  for name in cmap_dict.values():
+    code_counts[name] = code_counts.get(name, 0) + 1
+  return code_counts
+
+def get_dst_glyph_name(name, code, cmap_dict, code_counts, glyph_names, is_empty):
+  # the glyph code is merged into in place, or None to append a new one. A glyph
+  # other code points show too is kept for them, but an empty glyph named after
+  # code which no code point shows is reused
+  if code_counts.get(name, 0) <= (1 if cmap_dict.get(code) == name else 0):
+    return name
+  name = glyph_name_for_code(code)
+  if name in glyph_names and code_counts.get(name, 0) == 0 and is_empty(name):
+    return name
+  return None
+
+def set_cmap_code(cmap_dict, code_counts, code, name):
+  old_name = cmap_dict.get(code)
+  if old_name is not None:
+    code_counts[old_name] -= 1
+  cmap_dict[code] = name
+  code_counts[name] = code_counts.get(name, 0) + 1
+
+def get_unique_name(name, glyph_names):
+  new_name = name
+  i = 1
+  while new_name in glyph_names:
+    new_name = '%s.%d' % (name, i)
+    i += 1
+  return new_name
+
+def build_ttx_glyf_dict(glyphs, cmap_dict, codes):
+  # code -> TTGlyph, only for the code points in codes
+  glyf_dict = {}
+  for code in codes:
+    name = find_glyph_name(code, cmap_dict, glyphs)
+    if name is not None:
+      glyf_dict[code] = glyphs[name]
+  return glyf_dict
+
+def component_closure(names, get_components):
+  # names plus all glyphs they refer to through components, each once
+  required = []
+  seen = set()
+  stack = list(names)
+  while stack:
+    name = stack.pop()
+    if name not in seen:
+      seen.add(name)
+      required.append(name)
+      stack.extend(get_components(name))
+  return required
+
+def get_component_names(names, glyph_names):
+  # copied components keep their name unless the base font already uses it
+  renames = {}
+  used_names = set(glyph_names)
+  for name in names:
+    renames[name] = get_unique_name(name, used_names)
+    used_names.add(renames[name])
+  return renames
+
+def rename_ttx_components(glyph, renames):
+  # components are replaced rather than changed, streamed glyphs share them with their source
+  for i, child in enumerate(glyph):
+    if child.tag == 'component' and child.attrib['glyphName'] in renames:
+      component = ET.Element(child.tag, child.attrib)
+      component.set('glyphName', renames[child.attrib['glyphName']])
+      component.tail = child.tail
+      glyph[i] = component
+
+def is_code_glyph_name(name):
+  # glyph names --optimize may remove from the cmap when the glyph is empty
+  code = code_from_glyph_name(name)
+  return code is not None and code != 0
+
+def ttx_tag(tag):
+  # element name of a table in ttx files
+  return tag.replace('/', '_')
+
+def merge_font(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exist, out_file, optimize_size, stats=None,
+               split_file=None):
+  # returns stats, the MergeStats the phases and counters are recorded to. With split_file,
+  # SPLIT_TABLES are written there instead, along with SPLIT_SHARED_TABLES
+  if stats is None:
+    stats = MergeStats()
   cmap_tags = []
   for i in cmap_versions:
     cmap_tags.append('cmap_format_%s' % str(i))
 
+  # components of copied glyphs are found as they are when merging a font into itself
+  same_font = os.path.abspath(base_file) == os.path.abspath(merge_file)
+
+  stats.begin('parse')
   base_tree = ET.parse(base_file)
   base_root = base_tree.getroot()
   base_glyf = base_root.find('glyf')
   base_cmap = base_root.find('cmap')
   base_hmtx = base_root.find('hmtx')
   base_vmtx = base_root.find('vmtx')
+  base_gvar = base_root.find('gvar')
   base_glyph_order = base_root.find('GlyphOrder')
   base_glyph_order_max = 0
-  base_glyf_dict = {}
 
-  # Check if this is a CFF font (OTF) instead of TTF
+  # Check if this is a CFF font (OTF) instead of TTF, partial dumps leave the CFF table out
   base_cff = base_root.find('CFF')
-  is_cff_font = base_cff is not None
+  is_cff_font = base_cff is not None or base_root.get('sfntVersion') == 'OTTO'
 
   merge_tree = ET.parse(merge_file)
   merge_root = merge_tree.getroot()
@@ -64,39 +277,18 @@ def merge_font(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exi
   merge_cmap = merge_root.find('cmap')
   merge_hmtx = merge_root.find('hmtx')
   merge_vmtx = merge_root.find('vmtx')
-  merge_cff = merge_root.find('CFF')
-  merge_glyf_dict = {}
+  merge_gvar = merge_root.find('gvar')
 
+  stats.begin('index')
   # For CFF fonts, we need to build a mapping from unicode code point to glyph name via cmap
-  if is_cff_font:
-    # Build cmap lookup: code -> glyph name
-    merge_cmap_dict = {}
-    base_cmap_dict = {}
-    for cmap_table in merge_cmap.findall('*'):
-      if cmap_table.tag.startswith('cmap_format_'):
-        for map_entry in cmap_table.findall('map'):
-          code = map_entry.attrib['code'].lower()
-          if code.startswith('0x'):
-            code = code[2:]
-          merge_cmap_dict[code] = map_entry.attrib['name']
-    for cmap_table in base_cmap.findall('*'):
-      if cmap_table.tag.startswith('cmap_format_'):
-        for map_entry in cmap_table.findall('map'):
-          code = map_entry.attrib['code'].lower()
-          if code.startswith('0x'):
-            code = code[2:]
-          base_cmap_dict[code] = map_entry.attrib['name']
-  else:
-    # TTF font: use glyf table
-    for glyph in base_glyf.findall('TTGlyph'):
-      name = glyph.attrib['name'].lower()
-      if name.startswith('uni'):
-        base_glyf_dict[name[3:]] = glyph
-
-    for glyph in merge_glyf.findall('TTGlyph'):
-      name = glyph.attrib['name'].lower()
-      if name.startswith('uni'):
-        merge_glyf_dict[name[3:]] = glyph
+  merge_cmap_dict = build_ttx_cmap_dict(merge_cmap)
+  base_cmap_dict = build_ttx_cmap_dict(base_cmap)
+  if not is_cff_font:
+    # TTF font: glyphs are looked up via cmap too, only for the mapped code points
+    base_glyph_index = index_children(base_glyf, 'TTGlyph')
+    base_code_counts = count_glyph_codes(base_cmap_dict)
+    base_glyf_dict = build_ttx_glyf_dict(base_glyph_index, base_cmap_dict, set(merge_cp_map.values()))
+    merge_glyf_dict = build_ttx_glyf_dict(index_children(merge_glyf, 'TTGlyph'), merge_cmap_dict, merge_cp_map)
 
   for glyph in base_glyph_order.findall('GlyphID'):
     base_glyph_order_max = max(base_glyph_order_max, int(glyph.attrib['id']))
@@ -104,91 +296,1077 @@ def merge_font(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exi
   base_cmaps = []
   for cmap in base_cmap.findall('*'):
     if cmap.tag.startswith('cmap_format_'):
-      if cmap.tag in cmap_tags:
-        base_cmaps.append(cmap)
-      else:
+      if cmap.tag not in cmap_tags:
         base_cmap.remove(cmap)
+      elif cmap.tag != 'cmap_format_14':
+        base_cmaps.append(cmap)
+  max_code, add_cmap = get_full_range_cmap([cmap.tag[len('cmap_format_'):] for cmap in base_cmaps], cmap_versions, merge_cp_map)
+  if add_cmap:
+    # filled like the other subtables, starting from the BMP entries
+    bmp = find_bmp_cmap([(int(cmap.attrib['platformID']), int(cmap.attrib['platEncID'])) for cmap in base_cmaps])
+    cmap = new_ttx_full_range_cmap()
+    if bmp is not None:
+      cmap.extend(copy.deepcopy(base_cmaps[bmp].findall('map')))
+    base_cmap.append(cmap)
+    base_cmaps.append(cmap)
 
-  for src_code in merge_cp_map:
+  # index every table once, the indexes are kept updated while merging
+  base_cmap_indexes = [index_children(cmap, 'map', 'code', parse_code) for cmap in base_cmaps]
+  base_cmap_formats = [cmap.tag[len('cmap_format_'):] for cmap in base_cmaps]
+  base_hmtx_index = index_children(base_hmtx, 'mtx')
+  base_vmtx_index = index_children(base_vmtx, 'mtx')
+  merge_hmtx_index = index_children(merge_hmtx, 'mtx')
+  merge_vmtx_index = index_children(merge_vmtx, 'mtx')
+  base_gvar_index = index_children(base_gvar, 'glyphVariations', 'glyph')
+  merge_gvar_index = index_children(merge_gvar, 'glyphVariations', 'glyph')
+  written_glyphs = {}
+  merged_codes = set()
+
+  stats.begin('merge')
+  for src_code in stats.progress(merge_cp_map, 'merge'):
     dst_code = merge_cp_map[src_code]
-    if dst_code > MAX_CODE:
+    if dst_code > max_code:
+      stats.count('skipped_out_of_range')
       continue
-    src_code_hex = '%04x' % src_code
-    dst_code_hex = '%04x' % dst_code
 
     if is_cff_font:
       # CFF font: update cmap to point dst code to the same glyph as src code
-      if src_code_hex not in merge_cmap_dict:
+      if src_code not in merge_cmap_dict:
+        stats.count('skipped_missing')
         continue
-      src_glyph_name = merge_cmap_dict[src_code_hex]
+      name = new_name = merge_cmap_dict[src_code]
 
       # Check if dst code already has a glyph and we shouldn't overwrite
-      if dst_code_hex in base_cmap_dict and not overwrite_exist:
+      if dst_code in base_cmap_dict and not overwrite_exist:
+        stats.count('skipped_existing')
         continue
-
-      # Update all cmap tables to map dst_code to src_glyph_name
-      for cmap in base_cmaps:
-        node = ET.Element('map')
-        node.set('code', '0x' + dst_code_hex)
-        node.set('name', src_glyph_name)
-        replace_child(cmap, node)
-
-      # Copy hmtx/vmtx if needed (use original glyph name)
-      copy_child_to_node(merge_hmtx, 'mtx', src_glyph_name, src_glyph_name, base_hmtx)
-      copy_child_to_node(merge_vmtx, 'mtx', src_glyph_name, src_glyph_name, base_vmtx)
     else:
-      # TTF font: original logic
-      # check if src code exists in merge ttx
-      if src_code_hex not in merge_glyf_dict:
+      # TTF font: check if src code exists in merge ttx
+      if src_code not in merge_glyf_dict:
+        stats.count('skipped_missing')
         continue
-      if dst_code_hex in base_glyf_dict and not overwrite_exist and len(base_glyf_dict[dst_code_hex]) > 0:
+      dst = base_glyf_dict.get(dst_code)
+      if dst is not None and not overwrite_exist and len(dst) > 0:
+        stats.count('skipped_existing')
         continue
-      name = 'uni' + src_code_hex.upper()
-      new_name = 'uni' + dst_code_hex.upper()
+      name = merge_glyf_dict[src_code].attrib['name']
+      if dst is not None:
+        dst = base_glyph_index.get(get_dst_glyph_name(dst.attrib['name'], dst_code, base_cmap_dict, base_code_counts,
+                                                      base_glyph_index, lambda n: len(base_glyph_index[n]) == 0))
+      # replaced glyphs keep their name, which GlyphOrder refers to
+      if dst is not None:
+        new_name = dst.attrib['name']
+      else:
+        new_name = get_unique_name(glyph_name_for_code(dst_code), base_glyph_index)
 
       # dealing with glyph
-      glyf = copy.deepcopy(merge_glyf_dict[src_code_hex])
+      glyf = copy.deepcopy(merge_glyf_dict[src_code])
       glyf.set('name', new_name)
-      if dst_code_hex in base_glyf_dict:
+      set_cmap_code(base_cmap_dict, base_code_counts, dst_code, new_name)
+      if dst is not None:
         # if dst code exists in base ttx, just replace its glyph
-        base_glyf_dict[dst_code_hex].clear()
-        base_glyf_dict[dst_code_hex].attrib = glyf.attrib
+        dst.clear()
+        dst.attrib = glyf.attrib
         for c in glyf:
-          base_glyf_dict[dst_code_hex].append(c)
+          dst.append(c)
+        base_glyf_dict[dst_code] = dst
+        stats.count('glyphs_replaced')
       else:
         # or create new glyph and append it
         base_glyf.append(glyf)
-        base_glyf_dict[dst_code_hex] = glyf
+        base_glyf_dict[dst_code] = base_glyph_index[new_name] = glyf
         glyph_order = ET.Element('GlyphID')
         glyph_order.set('id', str(base_glyph_order_max + 1))
         glyph_order.set('name', new_name)
         base_glyph_order.append(glyph_order)
         base_glyph_order_max = base_glyph_order_max + 1
+        stats.count('glyphs_appended')
+      written_glyphs[new_name] = base_glyf_dict[dst_code]
+      set_ttx_variations(base_gvar, base_gvar_index, new_name, merge_gvar_index.get(name))
 
-      # dealing with cmaps
-      for cmap in base_cmaps:
+    # dealing with cmaps, code points above U+FFFF only fit in format 12/13
+    for cmap, cmap_index, cmap_format in zip(base_cmaps, base_cmap_indexes, base_cmap_formats):
+      if cmap_accepts_code(cmap_format, dst_code):
         node = ET.Element('map')
-        node.set('code', '0x' + dst_code_hex)
+        node.set('code', '0x%04x' % dst_code)
         node.set('name', new_name)
-        replace_child(cmap, node)
+        # each entry is counted once, as replaced if the base font had it
+        if dst_code not in merged_codes:
+          stats.count('cmap_entries_replaced' if dst_code in cmap_index else 'cmap_entries_added')
+        replace_child(cmap, cmap_index, dst_code, node)
+    merged_codes.add(dst_code)
+
+    # dealing with v and h mtx
+    copy_child_to_node(merge_hmtx_index, name, new_name, base_hmtx, base_hmtx_index)
+    copy_child_to_node(merge_vmtx_index, name, new_name, base_vmtx, base_vmtx_index)
 
-      # dealing with v and h mtx
-      copy_child_to_node(merge_hmtx, 'mtx', name, new_name, base_hmtx)
-      copy_child_to_node(merge_vmtx, 'mtx', name, new_name, base_vmtx)
+  if not is_cff_font and not same_font:
+    stats.begin('components')
+    # copy the components of copied composite glyphs, each once for all of them
+    merge_glyf_index = index_children(merge_glyf, 'TTGlyph')
+    composites = [written_glyphs[g.attrib['name']] for g in base_glyph_order.findall('GlyphID') if g.attrib['name'] in written_glyphs]
+    composites = [glyph for glyph in composites if glyph.find('component') is not None]
+    required = component_closure([c.attrib['glyphName'] for glyph in composites for c in glyph.findall('component')],
+                                 lambda name: [c.attrib['glyphName'] for c in merge_glyf_index[name].findall('component')])
+    renames = get_component_names(required, set(g.attrib['name'] for g in base_glyph_order.findall('GlyphID')))
+    stats.count('components_copied', len(required))
+    for name in required:
+      glyf = copy.deepcopy(merge_glyf_index[name])
+      glyf.set('name', renames[name])
+      composites.append(glyf)
+      base_glyf.append(glyf)
+      base_glyph_order_max = base_glyph_order_max + 1
+      base_glyph_order.append(ET.Element('GlyphID', {'id': str(base_glyph_order_max), 'name': renames[name]}))
+      copy_child_to_node(merge_hmtx_index, name, renames[name], base_hmtx, base_hmtx_index)
+      copy_child_to_node(merge_vmtx_index, name, renames[name], base_vmtx, base_vmtx_index)
+      set_ttx_variations(base_gvar, base_gvar_index, renames[name], merge_gvar_index.get(name))
+    for glyph in composites:
+      rename_ttx_components(glyph, renames)
+
+  # per-glyph tables would keep stale records for the written glyphs
+  if written_glyphs:
+    for table in [base_root.find(tag) for tag in PER_GLYPH_TABLES]:
+      if table is not None:
+        base_root.remove(table)
 
   # remove empty glyphs, because some cmap only supports max length 65535
   if optimize_size and not is_cff_font:
+    stats.begin('optimize')
+    empty_names = set()
     for glyph in base_glyf.findall('TTGlyph'):
-      if len(glyph) == 0 and glyph.attrib['name'] != 'uni0000' and glyph.attrib['name'].startswith('uni'):
-        name = glyph.attrib['name']
-        for cmap in base_cmaps:
-          remove_child(cmap, 'map', name)
-        # base_glyf.remove(glyph)
-        # remove_child(base_hmtx, 'mtx', name)
-        # remove_child(base_vmtx, 'mtx', name)
-        # remove_child(base_glyph_order, 'GlyphID', name)
+      if len(glyph) == 0 and is_code_glyph_name(glyph.attrib['name']):
+        empty_names.add(glyph.attrib['name'])
+    # filter each cmap in a single pass instead of one scan per empty glyph
+    for cmap in base_cmaps:
+      count = len(cmap)
+      remove_children(cmap, 'map', empty_names)
+      stats.count('cmap_entries_removed', count - len(cmap))
 
+  stats.begin('write')
+  if split_file is not None:
+    split_root = ET.Element(base_root.tag, base_root.attrib)
+    split_root.text = base_root.text
+    split_tags = set(ttx_tag(tag) for tag in SPLIT_TABLES)
+    shared_tags = set(ttx_tag(tag) for tag in SPLIT_SHARED_TABLES)
+    for table in list(base_root):
+      if table.tag in split_tags:
+        base_root.remove(table)
+        split_root.append(table)
+      elif table.tag in shared_tags:
+        split_root.append(table)
+    ET.ElementTree(split_root).write(split_file, xml_declaration=True, encoding="UTF-8")
   base_tree.write(out_file, xml_declaration=True, encoding="UTF-8")
+  stats.end()
+  return stats
+
+# Elements which are streamed as a whole, everything else is streamed tag by tag
+STREAM_ATOMIC_TAGS = set(['TTGlyph', 'map', 'mtx', 'glyphVariations', 'GlyphID', 'CharString'])
+
+def iter_ttx_elements(xml_file):
+  # yield (ancestors, elem) for each element outside the atomic subtrees once it
+  # is fully parsed, it is dropped from the tree afterwards to bound memory
+  stack = []
+  atomic = 0
+  for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+    if event == 'start':
+      if atomic or elem.tag in STREAM_ATOMIC_TAGS:
+        atomic += 1
+      stack.append(elem)
+      continue
+    stack.pop()
+    if atomic:
+      atomic -= 1
+      if atomic:
+        continue
+    yield stack, elem
+    if stack:
+      stack[-1].remove(elem)
+
+def xml_start_tag(elem):
+  return '<%s%s>' % (elem.tag, ''.join(' %s=%s' % (k, quoteattr(v)) for k, v in elem.attrib.items()))
+
+def xml_element(elem):
+  elem.tail = None
+  return ET.tostring(elem, encoding='unicode')
+
+def scan_ttx_cmap(xml_file, codes):
+  cmap_dict = {}
+  for ancestors, elem in iter_ttx_elements(xml_file):
+    if elem.tag == 'map' and len(ancestors) > 2 and ancestors[1].tag == 'cmap' and 'code' in elem.attrib:
+      code = parse_code(elem.attrib['code'])
+      if code in codes:
+        cmap_dict[code] = elem.attrib['name']
+  return cmap_dict
+
+def scan_base_ttx(base_file, dst_codes):
+  info = {
+    'is_cff_font': False,
+    'glyph_order_max': 0,
+    'glyph_order': [],  # glyph names by GlyphID, glyf is sorted by name
+    'glyphs': {},  # glyph name -> is not empty
+    'empty_names': set(),
+    'cmap': {},  # dst code -> glyph name
+    'code_counts': {},  # glyph name -> number of code points the cmap maps to it
+    'cmap_subtables': [],  # (format, platformID, platEncID)
+  }
+  cmap_dict = {}
+  for ancestors, elem in iter_ttx_elements(base_file):
+    table = ancestors[1].tag if len(ancestors) > 1 else elem.tag
+    if elem.tag == 'CFF' and len(ancestors) == 1:
+      info['is_cff_font'] = True
+    elif not ancestors and elem.get('sfntVersion') == 'OTTO':
+      # partial dumps leave the CFF table out
+      info['is_cff_font'] = True
+    elif elem.tag == 'GlyphID' and table == 'GlyphOrder':
+      info['glyph_order_max'] = max(info['glyph_order_max'], int(elem.attrib['id']))
+      info['glyph_order'].append(elem.attrib['name'])
+    elif elem.tag == 'TTGlyph' and table == 'glyf':
+      name = elem.attrib['name']
+      info['glyphs'][name] = len(elem) > 0
+      if len(elem) == 0 and is_code_glyph_name(name):
+        info['empty_names'].add(name)
+    elif elem.tag == 'map' and table == 'cmap' and 'code' in elem.attrib:
+      code = parse_code(elem.attrib['code'])
+      cmap_dict[code] = elem.attrib['name']
+      if code in dst_codes:
+        info['cmap'][code] = elem.attrib['name']
+    elif table == 'cmap' and len(ancestors) == 2 and elem.tag.startswith('cmap_format_') and elem.tag != 'cmap_format_14':
+      info['cmap_subtables'].append((elem.tag[len('cmap_format_'):], elem.attrib['platformID'], elem.attrib['platEncID']))
+  info['code_counts'] = count_glyph_codes(cmap_dict)
+  return info
+
+def scan_merge_ttx(merge_file, src_codes, cmap_dict=None):
+  # source glyphs, metrics and glyph variations by glyph name, only for the glyphs src_codes
+  # refer to, and the component names of all composite glyphs.
+  # Without cmap_dict the cmap is read on the way, ttx writes it before glyf and
+  # the metrics tables; None is returned if this file has them the other way round.
+  scan_cmap = cmap_dict is None
+  if scan_cmap:
+    cmap_dict = {}
+    names = None
+  else:
+    names = set(cmap_dict.values()) | set(glyph_name_for_code(code) for code in src_codes)
+  glyphs = {}
+  mtx = {'hmtx': {}, 'vmtx': {}}
+  variations = {}
+  components = {}
+  for ancestors, elem in iter_ttx_elements(merge_file):
+    table = ancestors[1].tag if len(ancestors) > 1 else elem.tag
+    if elem.tag == 'map' and table == 'cmap' and 'code' in elem.attrib:
+      code = parse_code(elem.attrib['code'])
+      if scan_cmap and code in src_codes:
+        cmap_dict[code] = elem.attrib['name']
+    elif elem.tag == 'cmap' and len(ancestors) == 1:
+      if scan_cmap:
+        names = set(cmap_dict.values()) | set(glyph_name_for_code(code) for code in src_codes)
+    elif (elem.tag == 'TTGlyph' and table == 'glyf') or (elem.tag == 'mtx' and table in mtx):
+      if names is None:
+        return None
+      name = elem.attrib['name']
+      if elem.tag == 'TTGlyph':
+        component_names = [c.attrib['glyphName'] for c in elem.findall('component')]
+        if component_names:
+          components[name] = component_names
+      if name in names:
+        if elem.tag == 'TTGlyph':
+          glyphs[name] = elem
+        else:
+          mtx[table][name] = elem.attrib
+    elif elem.tag == 'glyphVariations' and table == 'gvar':
+      if names is None:
+        return None
+      if elem.attrib['glyph'] in names:
+        variations[elem.attrib['glyph']] = elem
+  return cmap_dict, glyphs, mtx, components, variations
+
+def scan_ttx_glyphs(xml_file, names):
+  # glyphs, metrics and glyph variations of the given glyph names
+  glyphs = {}
+  mtx = {'hmtx': {}, 'vmtx': {}}
+  variations = {}
+  for ancestors, elem in iter_ttx_elements(xml_file):
+    table = ancestors[1].tag if len(ancestors) > 1 else elem.tag
+    if elem.tag == 'TTGlyph' and table == 'glyf' and elem.attrib['name'] in names:
+      glyphs[elem.attrib['name']] = elem
+    elif elem.tag == 'mtx' and table in mtx and elem.attrib['name'] in names:
+      mtx[table][elem.attrib['name']] = elem.attrib
+    elif elem.tag == 'glyphVariations' and table == 'gvar' and elem.attrib['glyph'] in names:
+      variations[elem.attrib['glyph']] = elem
+  return glyphs, mtx, variations
+
+def write_ttx_stream(base_file, out_file, cmap_tags, glyph_replaces, appends, cmap_updates, mtx_updates, drop_names, stats,
+                     drop_tables=(), split_file=None, add_cmap=None):
+  # copy base_file to out_file element by element, rewriting the merged tables on the way
+  # and leaving out drop_tables. mtx_updates has the new records of hmtx, vmtx and gvar by
+  # glyph name, added at the end of their table unless they replace one. With split_file, SPLIT_TABLES are written there instead,
+  # along with SPLIT_SHARED_TABLES. add_cmap: (platformID, platEncID) of the subtable whose
+  # entries an added format 12 subtable starts from, () if there is none, None to add none
+  files = [open(out_file, 'w', encoding='utf-8')]
+  if split_file is not None:
+    files.append(open(split_file, 'w', encoding='utf-8'))
+  split_tags = set(ttx_tag(tag) for tag in SPLIT_TABLES)
+  shared_tags = set(ttx_tag(tag) for tag in SPLIT_SHARED_TABLES)
+  targets = files
+
+  def write(text):
+    for f in targets:
+      f.write(text)
+
+  write("<?xml version='1.0' encoding='UTF-8'?>\n")
+  stack = []  # [elem, start tag written]
+  atomic = 0
+  skip = 0
+  written = set()
+  # the entries of the subtable add_cmap names are kept for the added one, and counted for both
+  bmp_ids = add_cmap or None
+  full_range_maps = []
+  copies = 1
+  for event, elem in ET.iterparse(base_file, events=('start', 'end')):
+    if event == 'start':
+      if atomic:
+        atomic += 1
+      elif skip:
+        skip += 1
+      else:
+        if stack and not stack[-1][1]:
+          write(xml_start_tag(stack[-1][0]) + escape((stack[-1][0].text or '').strip()) + '\n')
+          stack[-1][1] = True
+        if len(stack) == 1 and split_file is not None:
+          targets = files[1:] if elem.tag in split_tags else files if elem.tag in shared_tags else files[:1]
+        if elem.tag.startswith('cmap_format_') or elem.tag in mtx_updates:
+          written = set()
+          if elem.tag.startswith('cmap_format_') and elem.tag not in cmap_tags:
+            skip = 1
+          elif (elem.get('platformID'), elem.get('platEncID')) == bmp_ids and elem.tag != 'cmap_format_14':
+            copies = 2
+            bmp_ids = None
+        elif len(stack) == 1 and elem.tag in drop_tables:
+          skip = 1
+        elif elem.tag in STREAM_ATOMIC_TAGS:
+          atomic = 1
+      stack.append([elem, False])
+      continue
+
+    elem, opened = stack.pop()
+    parent = stack[-1][0] if stack else None
+    if skip:
+      skip -= 1
+      if not skip:
+        parent.remove(elem)
+      continue
+
+    if atomic:
+      atomic -= 1
+      if atomic:
+        continue
+      node = elem
+      name = elem.get('glyph') if elem.tag == 'glyphVariations' else elem.get('name')
+      if elem.tag == 'TTGlyph' and name in glyph_replaces:
+        node = glyph_replaces[name]
+      elif elem.tag == 'map' and parent.tag.startswith('cmap_format_') and parent.tag != 'cmap_format_14':
+        code = parse_code(elem.attrib['code'])
+        if code in cmap_updates:
+          written.add(code)
+          node = cmap_updates[code]
+          stats.count('cmap_entries_replaced', copies)
+        if node.attrib['name'] in drop_names:
+          node = None
+          stats.count('cmap_entries_removed', copies)
+        elif copies > 1:
+          full_range_maps.append(node)
+      elif elem.tag in ('mtx', 'glyphVariations') and parent.tag in mtx_updates and name in mtx_updates[parent.tag]:
+        written.add(name)
+        node = mtx_updates[parent.tag][name]
+      if node is not None:
+        write(xml_element(node) + '\n')
+      parent.remove(elem)
+      continue
+
+    if parent is None:
+      targets = files  # the root element is closed in both files
+    # append new entries at the end of the merged tables
+    if elem.tag.startswith('cmap_format_') and elem.tag != 'cmap_format_14':
+      # code points above U+FFFF only fit in format 12/13
+      cmap_format = elem.tag[len('cmap_format_'):]
+      nodes = [c for code, c in cmap_updates.items() if code not in written and cmap_accepts_code(cmap_format, code)]
+      stats.count('cmap_entries_added', len(nodes) * copies)
+      if drop_names:
+        kept = [c for c in nodes if c.attrib['name'] not in drop_names]
+        stats.count('cmap_entries_removed', (len(nodes) - len(kept)) * copies)
+        nodes = kept
+      if copies > 1:
+        full_range_maps.extend(nodes)
+        copies = 1
+    elif elem.tag == 'cmap' and len(stack) == 1 and add_cmap is not None:
+      # the entries above U+FFFF, or all of them if there is no subtable to start from
+      maps = [c for code, c in cmap_updates.items() if code > MAX_BMP_CODE or not add_cmap]
+      stats.count('cmap_entries_added', len(maps))
+      kept = [c for c in maps if c.attrib['name'] not in drop_names]
+      if drop_names:
+        stats.count('cmap_entries_removed', len(maps) - len(kept))
+      nodes = [new_ttx_full_range_cmap()]
+      nodes[0].extend(full_range_maps + kept)
+    elif elem.tag in mtx_updates:
+      nodes = [c for name, c in mtx_updates[elem.tag].items() if name not in written]
+    else:
+      nodes = appends.get(elem.tag, [])
+    if nodes and not opened:
+      write(xml_start_tag(elem) + escape((elem.text or '').strip()) + '\n')
+      opened = True
+    if opened:
+      for node in nodes:
+        write(xml_element(node) + '\n')
+      write('</%s>\n' % elem.tag)
+    else:
+      write(xml_element(elem) + '\n')
+    if parent is not None:
+      parent.remove(elem)
+  for f in files:
+    f.close()
+
+def copy_stream_variations(variations, name):
+  # renamed shallow copy of the source glyph variations, empty if it has none
+  node = ET.Element('glyphVariations', {'glyph': name})
+  if variations is not None:
+    node.extend(list(variations))
+  return node
+
+def merge_font_streaming(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exist, out_file, optimize_size, stats=None,
+                         split_file=None):
+  # Same as merge_font, but the ttx files are never loaded as a whole: only the
+  # source glyphs and metrics referenced by merge_cp_map are kept in memory.
+  if stats is None:
+    stats = MergeStats()
+  cmap_tags = set('cmap_format_%s' % str(i) for i in cmap_versions)
+  mapping = []
+  for src_code in merge_cp_map:
+    dst_code = merge_cp_map[src_code]
+    if dst_code <= MAX_CODE:
+      mapping.append((src_code, dst_code))
+    else:
+      stats.count('skipped_out_of_range')
+  dst_codes = set(m[1] for m in mapping)
+
+  stats.begin('parse')
+  base = scan_base_ttx(base_file, dst_codes)
+  cmap_subtables = [c for c in base['cmap_subtables'] if 'cmap_format_%s' % c[0] in cmap_tags]
+  max_code, add_cmap = get_full_range_cmap([c[0] for c in cmap_subtables], cmap_versions, merge_cp_map)
+  if max_code < MAX_CODE:
+    skipped = [m for m in mapping if m[1] > max_code]
+    if skipped:
+      stats.count('skipped_out_of_range', len(skipped))
+    mapping = [m for m in mapping if m[1] <= max_code]
+  if add_cmap:
+    bmp = find_bmp_cmap([(int(c[1]), int(c[2])) for c in cmap_subtables])
+    add_cmap = cmap_subtables[bmp][1:] if bmp is not None else ()
+  else:
+    add_cmap = None
+  src_codes = set(m[0] for m in mapping)
+  is_cff_font = base['is_cff_font']
+  glyph_order_max = base['glyph_order_max']
+
+  glyph_replaces = {}
+  appends = {'glyf': [], 'GlyphOrder': []}
+  cmap_updates = {}
+  mtx_updates = {'hmtx': {}, 'vmtx': {}}
+  # the variations of each written glyph, those of the glyph it replaces would not match its points
+  variation_updates = {}
+  drop_names = set()
+
+  merge = scan_merge_ttx(merge_file, src_codes)
+  if merge is None:
+    # the cmap comes after glyf, find the source glyph names first
+    merge = scan_merge_ttx(merge_file, src_codes, scan_ttx_cmap(merge_file, src_codes))
+  merge_cmap_dict, merge_glyphs, merge_mtx, merge_components, merge_variations = merge
+
+  stats.begin('index')
+  if not is_cff_font:
+    # TTF font: glyphs are looked up via cmap too, code -> [glyph name, is not empty]
+    base_glyf_dict = {}
+    for code in dst_codes:
+      name = find_glyph_name(code, base['cmap'], base['glyphs'])
+      if name is not None:
+        base_glyf_dict[code] = [name, base['glyphs'][name]]
+    glyph_names = set(base['glyphs'])
+    merge_glyf_dict = {}
+    for code in src_codes:
+      name = find_glyph_name(code, merge_cmap_dict, merge_glyphs)
+      if name is not None:
+        merge_glyf_dict[code] = merge_glyphs[name]
+
+  stats.begin('merge')
+  for src_code, dst_code in stats.progress(mapping, 'merge'):
+    if is_cff_font:
+      # CFF font: update cmap to point dst code to the same glyph as src code
+      if src_code not in merge_cmap_dict:
+        stats.count('skipped_missing')
+        continue
+      if dst_code in base['cmap'] and not overwrite_exist:
+        stats.count('skipped_existing')
+        continue
+      name = new_name = merge_cmap_dict[src_code]
+    else:
+      if src_code not in merge_glyf_dict:
+        stats.count('skipped_missing')
+        continue
+      dst = base_glyf_dict.get(dst_code)
+      if dst is not None and not overwrite_exist and dst[1]:
+        stats.count('skipped_existing')
+        continue
+      src_glyf = merge_glyf_dict[src_code]
+      name = src_glyf.attrib['name']
+      if dst is not None:
+        dst_name = get_dst_glyph_name(dst[0], dst_code, base['cmap'], base['code_counts'], base['glyphs'],
+                                      lambda n: not base['glyphs'][n])
+        if dst_name != dst[0]:
+          dst = None if dst_name is None else [dst_name, base['glyphs'][dst_name]]
+      # replaced glyphs keep their name, which GlyphOrder refers to
+      new_name = dst[0] if dst is not None else get_unique_name(glyph_name_for_code(dst_code), glyph_names)
+      set_cmap_code(base['cmap'], base['code_counts'], dst_code, new_name)
+
+      # renamed shallow copy, the children are shared with the source glyph
+      glyf = ET.Element(src_glyf.tag, src_glyf.attrib)
+      glyf.set('name', new_name)
+      glyf.extend(list(src_glyf))
+      if dst is None:
+        appends['glyf'].append(glyf)
+        glyph_order_max = glyph_order_max + 1
+        appends['GlyphOrder'].append(ET.Element('GlyphID', {'id': str(glyph_order_max), 'name': new_name}))
+        glyph_names.add(new_name)
+        dst = base_glyf_dict[dst_code] = [new_name, False, glyf]
+        stats.count('glyphs_appended')
+      elif len(dst) > 2:
+        # glyph appended by an earlier mapping, replace it in place
+        dst[2].attrib = glyf.attrib
+        dst[2][:] = list(glyf)
+        stats.count('glyphs_replaced')
+      else:
+        glyph_replaces[dst[0]] = glyf
+        base_glyf_dict[dst_code] = dst
+        stats.count('glyphs_replaced')
+      dst[1] = len(glyf) > 0
+      variation_updates[new_name] = copy_stream_variations(merge_variations.get(name), new_name)
+
+    cmap_updates[dst_code] = ET.Element('map', {'code': '0x%04x' % dst_code, 'name': new_name})
+    for tag in mtx_updates:
+      if name in merge_mtx[tag]:
+        mtx_updates[tag][new_name] = ET.Element('mtx', merge_mtx[tag][name])
+        mtx_updates[tag][new_name].set('name', new_name)
+
+  if not is_cff_font and os.path.abspath(base_file) != os.path.abspath(merge_file):
+    stats.begin('components')
+    # copy the components of copied composite glyphs, each once for all of them
+    composites = [glyph_replaces[name] for name in base['glyph_order'] if name in glyph_replaces] + appends['glyf']
+    composites = [glyf for glyf in composites if glyf.find('component') is not None]
+    required = component_closure([c.attrib['glyphName'] for glyf in composites for c in glyf.findall('component')],
+                                 lambda name: merge_components.get(name, []))
+    missing = set(required) - set(merge_glyphs)
+    if missing:
+      # components the mapping does not refer to directly need another pass
+      glyphs, mtx, variations = scan_ttx_glyphs(merge_file, missing)
+      merge_glyphs.update(glyphs)
+      for tag in mtx:
+        merge_mtx[tag].update(mtx[tag])
+      merge_variations.update(variations)
+    renames = get_component_names(required, glyph_names)
+    stats.count('components_copied', len(required))
+    for name in required:
+      glyf = ET.Element(merge_glyphs[name].tag, merge_glyphs[name].attrib)
+      glyf.set('name', renames[name])
+      glyf.extend(list(merge_glyphs[name]))
+      composites.append(glyf)
+      appends['glyf'].append(glyf)
+      glyph_order_max = glyph_order_max + 1
+      appends['GlyphOrder'].append(ET.Element('GlyphID', {'id': str(glyph_order_max), 'name': renames[name]}))
+      for tag in mtx_updates:
+        if name in merge_mtx[tag]:
+          mtx_updates[tag][renames[name]] = ET.Element('mtx', merge_mtx[tag][name])
+          mtx_updates[tag][renames[name]].set('name', renames[name])
+      variation_updates[renames[name]] = copy_stream_variations(merge_variations.get(name), renames[name])
+    for glyf in composites:
+      rename_ttx_components(glyf, renames)
+
+  # remove empty glyphs from cmap, the entries are dropped and counted while writing
+  if optimize_size and not is_cff_font:
+    stats.begin('optimize')
+    drop_names = set(base['empty_names'])
+    for glyf in list(glyph_replaces.values()) + appends['glyf']:
+      drop_names.discard(glyf.attrib['name'])
+      if len(glyf) == 0 and is_code_glyph_name(glyf.attrib['name']):
+        drop_names.add(glyf.attrib['name'])
+    stats.count('cmap_entries_removed', 0)
+
+  stats.begin('write')
+  write_ttx_stream(base_file, out_file, cmap_tags, glyph_replaces, appends, cmap_updates, dict(mtx_updates, gvar=variation_updates),
+                   drop_names, stats, PER_GLYPH_TABLES if glyph_replaces or appends['glyf'] else (), split_file, add_cmap)
+  stats.end()
+  return stats
+
+def load_font(font_file):
+  if os.path.splitext(font_file)[1].lower() == '.ttx':
+    font = TTFont()
+    font.importXML(font_file)
+    return font
+  return TTFont(font_file)
+
+def save_font(font, out_file):
+  if os.path.splitext(out_file)[1].lower() == '.ttx':
+    font.saveXML(out_file)
+  else:
+    # tables only read by the merge, e.g. CFF to get the glyph order, are
+    # copied from the input file instead of being compiled again
+    if font.reader is not None:
+      for tag in list(font.tables):
+        if tag not in MERGED_TABLES and tag in font.reader:
+          del font.tables[tag]
+      # the merged tables the merge did not load are compiled too, or fields recalculated
+      # when compiling, e.g. the first and last char index of OS/2, would stay stale
+      for tag in MERGED_TABLES:
+        if tag in font.reader:
+          font[tag]
+    font.save(out_file)
+
+def is_empty_glyph(glyph):
+  # glyphs which have not been expanded yet still carry their raw data
+  if hasattr(glyph, 'data'):
+    return glyph.data[:2] == b'\0\0'
+  return glyph.numberOfContours == 0
+
+def build_cmap_dict(font):
+  cmap_dict = {}
+  for cmap_table in font['cmap'].tables:
+    if cmap_table.format != 14:
+      cmap_dict.update(cmap_table.cmap)
+  return cmap_dict
+
+def copy_metrics(font, name, new_name, dst_font, tag):
+  if tag not in font or tag not in dst_font:
+    return
+  metrics = font[tag].metrics
+  if name in metrics:
+    dst_font[tag].metrics[new_name] = metrics[name]
+
+def copy_variations(font, name, new_name, dst_font):
+  # a copied glyph takes the variations of its source, or none if font is None or has no
+  # gvar, the variations of the glyph it replaces would not match its points
+  if 'gvar' not in dst_font:
+    return
+  variations = font['gvar'].variations.get(name) if font is not None and 'gvar' in font else None
+  # assigned rather than removed, removing would decompile the old ones first
+  dst_font['gvar'].variations[new_name] = copy.deepcopy(variations) if variations else []
+
+def build_glyf_dict(font, cmap_dict, codes):
+  # code -> glyph name, only for the code points in codes
+  glyph_names = font['glyf'].glyphs
+  glyf_dict = {}
+  for code in codes:
+    name = find_glyph_name(code, cmap_dict, glyph_names)
+    if name is not None:
+      glyf_dict[code] = name
+  return glyf_dict
+
+def glyph_dedupe_key(font, name):
+  # compiled outline plus metrics, None if the glyph cannot be compiled in this font
+  glyf = font['glyf']
+  glyph = glyf[name]
+  glyph.expand(glyf)
+  try:
+    data = glyph.compile(glyf, recalcBBoxes=False)
+  except ValueError:
+    return None  # component missing from the glyph order
+  metrics = tuple(font[tag].metrics.get(name) if tag in font else None for tag in ('hmtx', 'vmtx'))
+  if 'gvar' in font:
+    # glyphs are only identical if they also vary the same way
+    return data, metrics, repr(font['gvar'].variations.get(name) or [])
+  return data, metrics
+
+def dedupe_glyphs(font, cmaps, keep_names, new_names):
+  # point the cmap entries of new glyphs at an identical glyph instead, kept glyphs are
+  # never removed as other tables may refer to them. Returns (glyphs, glyf bytes) saved.
+  glyf = font['glyf']
+  canonical = {}
+  for name in keep_names:
+    if name in glyf.glyphs:
+      key = glyph_dedupe_key(font, name)
+      if key is not None:
+        canonical.setdefault(key, name)
+  aliases = {}
+  saved_bytes = 0
+  for name in new_names:
+    key = glyph_dedupe_key(font, name)
+    if key is None:
+      continue
+    if key in canonical:
+      aliases[name] = canonical[key]
+      saved_bytes += len(key[0])
+    else:
+      canonical[key] = name
+  if not aliases:
+    return 0, 0
+
+  for name in list(keep_names) + list(new_names):
+    if name not in aliases and glyf.glyphs[name].isComposite():
+      for component in glyf.glyphs[name].components:
+        component.glyphName = aliases.get(component.glyphName, component.glyphName)
+  for cmap in cmaps:
+    for code, name in cmap.cmap.items():
+      if name in aliases:
+        cmap.cmap[code] = aliases[name]
+  font.setGlyphOrder([name for name in font.getGlyphOrder() if name not in aliases])
+  for name in aliases:
+    del glyf.glyphs[name]
+    for tag in ('hmtx', 'vmtx'):
+      if tag in font:
+        font[tag].metrics.pop(name, None)
+    if 'gvar' in font:
+      font['gvar'].variations.pop(name, None)
+  return len(aliases), saved_bytes
+
+def merge_ttfont(base_font, src_font, merge_cp_map, cmap_versions, overwrite_exist, optimize_size, dedupe=False, same_font=False,
+                 component_names=None, stats=None):
+  # same_font: src_font is a copy of base_font, so components are found in it as they are
+  # component_names: source component -> its copy in base_font, copies found there are
+  # replaced in place instead of being appended again, new ones are added to it
+  if stats is None:
+    stats = MergeStats()
+  stats.begin('index')
+  cmap_formats = set(str(i) for i in cmap_versions)
+  base_glyph_order = list(base_font.getGlyphOrder())
+  base_glyph_count = len(base_glyph_order)
+
+  # Check if this is a CFF font (OTF) instead of TTF
+  is_cff_font = 'CFF ' in base_font
+
+  # glyphs are looked up via cmap, code -> glyph name
+  merge_cmap_dict = build_cmap_dict(src_font)
+  base_cmap_dict = build_cmap_dict(base_font)
+  if not is_cff_font:
+    # TTF font: glyphs are looked up via cmap too, only for the mapped code points
+    base_glyf = base_font['glyf']
+    merge_glyf = src_font['glyf']
+    if 'gvar' in base_font:
+      base_font['gvar']  # decompiled for the glyph order before the merge changes it
+    base_code_counts = count_glyph_codes(base_cmap_dict)
+    base_glyf_dict = build_glyf_dict(base_font, base_cmap_dict, set(merge_cp_map.values()))
+    merge_glyf_dict = build_glyf_dict(src_font, merge_cmap_dict, merge_cp_map)
+
+  base_cmap = base_font['cmap']
+  base_cmap.tables = [t for t in base_cmap.tables if str(t.format) in cmap_formats]
+  base_cmaps = [t for t in base_cmap.tables if t.format != 14]
+  max_code, add_cmap = get_full_range_cmap([t.format for t in base_cmaps], cmap_versions, merge_cp_map)
+  if add_cmap:
+    # filled like the other subtables, starting from the BMP entries
+    bmp = find_bmp_cmap([(t.platformID, t.platEncID) for t in base_cmaps])
+    cmap = CmapSubtable.newSubtable(12)
+    cmap.platformID, cmap.platEncID = FULL_RANGE_CMAP_IDS
+    cmap.language = 0
+    cmap.cmap = dict(base_cmaps[bmp].cmap) if bmp is not None else {}
+    base_cmap.tables.append(cmap)
+    base_cmaps.append(cmap)
+  # glyphs written by the merge, and base glyphs named like their sources
+  written_names = set()
+  source_names = set()
+  merged_codes = set()
+
+  stats.begin('merge')
+  for src_code in stats.progress(merge_cp_map, 'merge'):
+    dst_code = merge_cp_map[src_code]
+    if dst_code > max_code:
+      stats.count('skipped_out_of_range')
+      continue
+
+    if is_cff_font:
+      # CFF font: update cmap to point dst code to the same glyph as src code
+      name = dst_name = merge_cmap_dict.get(src_code)
+      if name is None:
+        stats.count('skipped_missing')
+        continue
+      if dst_code in base_cmap_dict and not overwrite_exist:
+        stats.count('skipped_existing')
+        continue
+    else:
+      name = merge_glyf_dict.get(src_code)
+      if name is None:
+        stats.count('skipped_missing')
+        continue
+      dst_name = base_glyf_dict.get(dst_code)
+      if dst_name is not None and not overwrite_exist and not is_empty_glyph(base_glyf.glyphs[dst_name]):
+        stats.count('skipped_existing')
+        continue
+      if dst_name is not None:
+        dst_name = get_dst_glyph_name(dst_name, dst_code, base_cmap_dict, base_code_counts, base_glyf.glyphs,
+                                      lambda n: is_empty_glyph(base_glyf.glyphs[n]))
+      glyph = copy.deepcopy(merge_glyf[name])
+      if dst_name is None:
+        # create new glyph and append it to glyph order
+        dst_name = get_unique_name(glyph_name_for_code(dst_code), base_glyf.glyphs)
+        base_glyph_order.append(dst_name)
+        base_glyf_dict[dst_code] = dst_name
+        stats.count('glyphs_appended')
+      else:
+        base_glyf_dict[dst_code] = dst_name
+        stats.count('glyphs_replaced')
+      set_cmap_code(base_cmap_dict, base_code_counts, dst_code, dst_name)
+      base_glyf.glyphs[dst_name] = glyph
+      copy_variations(src_font, name, dst_name, base_font)
+      written_names.add(dst_name)
+      source_names.add(name)
+
+    # code points above U+FFFF only fit in format 12/13, subtables may share one dict
+    existing = [dst_code in cmap.cmap for cmap in base_cmaps]
+    for cmap, exists in zip(base_cmaps, existing):
+      if cmap_accepts_code(cmap.format, dst_code):
+        # each entry is counted once, as replaced if the base font had it
+        if dst_code not in merged_codes:
+          stats.count('cmap_entries_replaced' if exists else 'cmap_entries_added')
+        cmap.cmap[dst_code] = dst_name
+    merged_codes.add(dst_code)
+    copy_metrics(src_font, name, dst_name, base_font, 'hmtx')
+    copy_metrics(src_font, name, dst_name, base_font, 'vmtx')
+
+  if not is_cff_font and not same_font:
+    stats.begin('components')
+    # copy the components of copied composite glyphs, each once for all of them
+    composites = [base_glyf.glyphs[name] for name in base_glyph_order if name in written_names]
+    composites = [glyph for glyph in composites if glyph.isComposite()]
+    required = component_closure([c.glyphName for glyph in composites for c in glyph.components],
+                                 lambda name: [c.glyphName for c in merge_glyf[name].components] if merge_glyf[name].isComposite() else [])
+    copied_names = component_names if component_names is not None else {}
+    reused = dict((name, copied_names[name]) for name in required if copied_names.get(name) in base_glyf.glyphs)
+    renames = get_component_names([name for name in required if name not in reused], set(base_glyph_order))
+    renames.update(reused)
+    copied_names.update(renames)
+    stats.count('components_copied', len(required))
+    for name in required:
+      glyph = copy.deepcopy(merge_glyf[name])
+      if glyph.isComposite():
+        composites.append(glyph)
+      base_glyf.glyphs[renames[name]] = glyph
+      copy_variations(src_font, name, renames[name], base_font)
+      if name not in reused:
+        base_glyph_order.append(renames[name])
+      copy_metrics(src_font, name, renames[name], base_font, 'hmtx')
+      copy_metrics(src_font, name, renames[name], base_font, 'vmtx')
+    for glyph in composites:
+      for component in glyph.components:
+        component.glyphName = renames[component.glyphName]
+    source_names.update(required)
+
+  if not is_cff_font:
+    base_font.setGlyphOrder(base_glyph_order)
+  # per-glyph tables would keep stale records for the written glyphs
+  if written_names:
+    for tag in PER_GLYPH_TABLES:
+      if tag in base_font:
+        del base_font[tag]
+
+  # remove empty glyphs, because some cmap only supports max length 65535
+  if optimize_size and not is_cff_font:
+    stats.begin('optimize')
+    empty_names = set()
+    for name in base_glyph_order:
+      if is_code_glyph_name(name) and is_empty_glyph(base_glyf.glyphs[name]):
+        empty_names.add(name)
+    for cmap in base_cmaps:
+      count = len(cmap.cmap)
+      cmap.cmap = dict((code, name) for code, name in cmap.cmap.items() if name not in empty_names)
+      stats.count('cmap_entries_removed', count - len(cmap.cmap))
+
+  # only glyphs appended by the merge can be removed as duplicates
+  if dedupe and not is_cff_font:
+    stats.begin('dedupe')
+    keep_names = [name for name in base_glyph_order[:base_glyph_count] if name in written_names or name in source_names]
+    glyphs, glyf_bytes = dedupe_glyphs(base_font, base_cmaps, keep_names, base_glyph_order[base_glyph_count:])
+    stats.count('glyphs_deduped', glyphs)
+    stats.count('glyf_bytes_deduped', glyf_bytes)
+  stats.end()
+  return stats
+
+def merge_font_ttfont(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exist, out_file, optimize_size, dedupe=False,
+                      stats=None):
+  # the source font is loaded separately even when it is the base font,
+  # so glyphs are always copied from the unmodified source
+  if stats is None:
+    stats = MergeStats()
+  # tables are decompiled lazily, mostly during the merge and write phases
+  stats.begin('parse')
+  base_font = load_font(base_file)
+  src_font = load_font(merge_file)
+  same_font = os.path.abspath(base_file) == os.path.abspath(merge_file)
+  merge_ttfont(base_font, src_font, merge_cp_map, cmap_versions, overwrite_exist, optimize_size, dedupe, same_font, stats=stats)
+  stats.begin('write')
+  save_font(base_font, out_file)
+  stats.end()
+  return stats
+
+# Sidecar manifest written next to outputs of --incremental, see merge_font_incremental
+MERGE_MANIFEST_VERSION = 2
+
+def get_merge_manifest_path(out_file):
+  return out_file + '.merge.json'
+
+def get_glyph_hash(font, name, hashes):
+  # compiled outline and metrics, plus the hashes of its components
+  if name not in hashes:
+    h = hashlib.sha256(repr(glyph_dedupe_key(font, name)).encode('utf-8'))
+    glyph = font['glyf'].glyphs[name]
+    if glyph.isComposite():
+      for component in glyph.components:
+        h.update(get_glyph_hash(font, component.glyphName, hashes).encode('utf-8'))
+    hashes[name] = h.hexdigest()
+  return hashes[name]
+
+def get_merge_entries(src_font, merge_cp_map):
+  # dst code -> [[src code, source glyph hash], ...] in mapping order, the hash is
+  # None when the source font has no glyph for src code
+  is_cff_font = 'CFF ' in src_font
+  merge_cmap_dict = build_cmap_dict(src_font)
+  hashes = {}
+  entries = {}
+  for src_code in merge_cp_map:
+    dst_code = merge_cp_map[src_code]
+    if dst_code > MAX_CODE:
+      continue
+    if is_cff_font:
+      # CFF glyphs are shared with the base font, only the name matters
+      glyph_hash = merge_cmap_dict.get(src_code)
+    else:
+      glyph_hash = find_glyph_name(src_code, merge_cmap_dict, src_font['glyf'].glyphs)
+      if glyph_hash is not None:
+        glyph_hash = get_glyph_hash(src_font, glyph_hash, hashes)
+    entries.setdefault(dst_code, []).append([src_code, glyph_hash])
+  return entries
+
+def restore_base_code(base_font, out_font, dst_code, base_cmap_dict):
+  # undo what a merge did to dst code in out_font, using base_font as it was before the merge
+  out_names = set([glyph_name_for_code(dst_code)])
+  for cmap in out_font['cmap'].tables:
+    if cmap.format == 14:
+      continue
+    if dst_code in cmap.cmap:
+      out_names.add(cmap.cmap[dst_code])
+    base_cmaps = [t for t in base_font['cmap'].tables
+                  if (t.platformID, t.platEncID, t.format) == (cmap.platformID, cmap.platEncID, cmap.format)]
+    if base_cmaps and dst_code in base_cmaps[0].cmap:
+      cmap.cmap[dst_code] = base_cmaps[0].cmap[dst_code]
+    else:
+      cmap.cmap.pop(dst_code, None)
+  if 'CFF ' in out_font:
+    return
+
+  base_glyf = base_font['glyf']
+  out_glyf = out_font['glyf']
+  name = find_glyph_name(dst_code, base_cmap_dict, base_glyf.glyphs)
+  if name is not None:
+    out_glyf.glyphs[name] = copy.deepcopy(base_glyf[name])
+    copy_metrics(base_font, name, name, out_font, 'hmtx')
+    copy_metrics(base_font, name, name, out_font, 'vmtx')
+    copy_variations(base_font, name, name, out_font)
+  # glyphs appended by the merge are emptied rather than removed so the glyph
+  # order stays valid for tables not loaded yet, the merge fills them like new ones
+  for name in out_names:
+    if name in out_glyf.glyphs and name not in base_glyf.glyphs:
+      out_glyf.glyphs[name] = Glyph()
+      copy_variations(None, name, name, out_font)
+
+def empty_unused_components(font, codes, component_names):
+  # empty the component copies no glyph of codes refers to any more, their names
+  # stay in component_names so a later merge fills them again. Returns the count.
+  if 'glyf' not in font or not component_names:
+    return 0
+  glyf = font['glyf']
+  cmap_dict = build_cmap_dict(font)
+  used = set(component_closure([cmap_dict[code] for code in codes if code in cmap_dict],
+                               lambda name: [c.glyphName for c in glyf[name].components] if glyf[name].isComposite() else []))
+  count = 0
+  for name in set(component_names.values()) - used:
+    if name in glyf.glyphs and not is_empty_glyph(glyf.glyphs[name]):
+      glyf.glyphs[name] = Glyph()
+      copy_variations(None, name, name, font)
+      count += 1
+  return count
+
+def merge_font_incremental(base_file, merge_file, merge_cp_map, cmap_versions, overwrite_exist, out_file, optimize_size, stats=None):
+  # Patch the code points whose mapping or source glyph changed since the last run into
+  # the existing out_file, or merge from scratch if out_file, its sidecar manifest, the
+  # base font or the options do not match. Returns stats, the number of patched code
+  # points is counted as codes_patched, which is missing after a full merge.
+  if stats is None:
+    stats = MergeStats()
+  stats.begin('compare')
+  manifest_path = get_merge_manifest_path(out_file)
+  options = {
+    'version': MERGE_MANIFEST_VERSION,
+    'base': file_hash(base_file),
+    'cmap': ','.join(str(c) for c in cmap_versions),
+    'overwrite': bool(overwrite_exist),
+    'optimize': bool(optimize_size),
+  }
+  manifest = None
+  if os.path.exists(manifest_path) and os.path.exists(out_file):
+    try:
+      with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    except ValueError:
+      manifest = None
+  if manifest is not None:
+    if any(manifest.get(k) != v for k, v in options.items()) or manifest.get('output') != file_hash(out_file):
+      manifest = None
+
+  stats.begin('parse')
+  base_font = load_font(base_file)
+  src_font = load_font(merge_file)
+  same_font = os.path.abspath(base_file) == os.path.abspath(merge_file)
+  stats.begin('compare')
+  entries = get_merge_entries(src_font, merge_cp_map)
+  # components copied by the earlier merge are reused under the same names
+  component_names = dict(manifest['components']) if manifest is not None else {}
+  if manifest is None:
+    merge_ttfont(base_font, src_font, merge_cp_map, cmap_versions, overwrite_exist, optimize_size, same_font=same_font,
+                 component_names=component_names, stats=stats)
+    out_font = base_font
+  else:
+    old_entries = dict((int(code), value) for code, value in manifest['entries'].items())
+    changed = set(code for code in set(entries) | set(old_entries) if entries.get(code) != old_entries.get(code))
+    stats.count('codes_patched', len(changed))
+    if not changed:
+      stats.end()
+      return stats
+    stats.begin('restore')
+    out_font = load_font(out_file)
+    base_cmap_dict = build_cmap_dict(base_font)
+    for dst_code in changed:
+      restore_base_code(base_font, out_font, dst_code, base_cmap_dict)
+    delta_cp_map = dict((src_code, dst_code) for src_code, dst_code in merge_cp_map.items() if dst_code in changed)
+    merge_ttfont(out_font, src_font, delta_cp_map, cmap_versions, overwrite_exist, optimize_size, same_font=same_font,
+                 component_names=component_names, stats=stats)
+    stats.count('components_emptied', empty_unused_components(out_font, entries, component_names))
+  stats.begin('write')
+  save_font(out_font, out_file)
+
+  # resulting glyph name of every mapped code point, for reference
+  out_cmap_dict = build_cmap_dict(out_font)
+  manifest = dict(options)
+  manifest['output'] = file_hash(out_file)
+  manifest['entries'] = dict((str(code), value) for code, value in entries.items())
+  manifest['glyphs'] = dict((str(code), out_cmap_dict.get(code)) for code in entries)
+  manifest['components'] = component_names
+  with open(manifest_path, 'w', encoding='utf-8') as f:
+    json.dump(manifest, f, sort_keys=True)
+  stats.end()
+  return stats
+
+def get_cmap_formats(font_file):
+  if TTFont is not None and os.path.splitext(font_file)[1].lower() != '.ttx':
+    return [str(t.format) for t in TTFont(font_file)['cmap'].tables]
+  # streamed, so --stream keeps its bounded memory, and stopped after the cmap table
+  formats = []
+  for ancestors, elem in iter_ttx_elements(font_file):
+    if len(ancestors) == 2 and ancestors[1].tag == 'cmap' and elem.tag.startswith('cmap_format_'):
+      formats.append(elem.tag[len('cmap_format_'):])
+    elif len(ancestors) == 1 and elem.tag == 'cmap':
+      break
+  return formats
 
 # Preset name mapping
 PRESET_MAP = {
@@ -199,6 +1377,318 @@ PRESET_MAP = {
   'None': {},  # No mapping, just convert format
 }
 
+def get_output_path(input_path, mapping):
+  # Generate default output path based on input filename
+  input_name, input_ext = os.path.splitext(input_path)
+  if mapping:
+    return '%s_%s%s' % (input_name, mapping, input_ext if input_ext else '.ttf')
+  return '%s%s' % (input_name, '.ttf' if input_ext.lower() in ['.otf', '.ttx'] else input_ext if input_ext else '.ttf')
+
+def get_cmap_versions(cmap):
+  if cmap == '':
+    return range(32)
+  return cmap.split(',')
+
+def get_ttx_version():
+  if TTFont is not None:
+    import fontTools
+    return fontTools.version
+  return os.popen('ttx --version').read().strip()
+
+def decompile_font(font_file, ttx_file=None, quiet=False, cache=None, tables=None):
+  # dump font_file to <name>.ttx with ttx, .ttx files are used as they are. With tables,
+  # only those are dumped, and the output must be compiled on top of font_file
+  filename, fileext = os.path.splitext(font_file)
+  if fileext.lower() == '.ttx':
+    return font_file
+  if ttx_file is None:
+    ttx_file = filename + '.ttx'
+  if os.path.exists(ttx_file):
+    os.remove(ttx_file)
+  if os.path.exists(font_file):
+    key = None
+    if cache is not None:
+      key = cache.make_key(cache.file_hash(font_file), get_ttx_version(), *([','.join(tables)] if tables else []))
+      if cache.fetch('ttx', key, '.ttx', ttx_file):
+        return ttx_file
+    table_args = ''.join('-t "%s" ' % tag for tag in tables or [])
+    run_command('ttx %s%s-o "%s" "%s"' % ('-q ' if quiet else '', table_args, ttx_file, font_file))
+    if key is not None and os.path.exists(ttx_file):
+      cache.store('ttx', key, '.ttx', ttx_file)
+  return ttx_file
+
+def get_output_cache_key(cache, base_path, source_path, mapping, cmap, overwrite, optimize, dedupe, output_path, use_ttfont, stream):
+  # the merge code and the mapping tables are part of the key, so editing them invalidates results
+  return cache.make_key(
+    cache.file_hash(base_path), cache.file_hash(source_path), mapping, ','.join(str(c) for c in get_cmap_versions(cmap)),
+    overwrite, optimize, dedupe, os.path.splitext(output_path)[1].lower(), 'ttfont' if use_ttfont else 'stream' if stream else 'xml',
+    cache.file_hash(__file__), cache.file_hash(cp_map.__file__), get_ttx_version())
+
+def read_sfnt_tables(data):
+  # sfnt version and (tag, checksum, offset, length) of each table, None if data is no sfnt font
+  sfnt_version, num_tables = struct.unpack('>4sH', data[:6])
+  if sfnt_version not in SFNT_VERSIONS:
+    return None
+  return sfnt_version, [struct.unpack('>4sLLL', data[12 + i * 16:28 + i * 16]) for i in range(num_tables)]
+
+def is_sfnt_font(font_file):
+  with open(font_file, 'rb') as f:
+    return f.read(4) in SFNT_VERSIONS
+
+def build_sfnt(sfnt_version, tables):
+  # tables are (tag, checksum, data) in file order, the directory is sorted by tag
+  entry_selector = len(tables).bit_length() - 1
+  search_range = 16 << entry_selector
+  header = struct.pack('>4sHHHH', sfnt_version, len(tables), search_range, entry_selector, len(tables) * 16 - search_range)
+  offset = 12 + len(tables) * 16
+  records = []
+  chunks = []
+  for tag, checksum, table in tables:
+    records.append(struct.pack('>4sLLL', tag, checksum, offset, len(table)))
+    chunks.append(table + b'\0' * (-len(table) % 4))
+    offset += len(chunks[-1])
+  return b''.join([header] + sorted(records) + chunks)
+
+def sfnt_checksum(data):
+  data += b'\0' * (-len(data) % 4)
+  return sum(struct.unpack('>%dL' % (len(data) // 4), data)) & 0xffffffff
+
+def strip_font_tables(font_file, out_file, tags):
+  # copy an sfnt font without the tables in tags, compiling on top of the copy with ttx -m
+  # recalculates the checksums. Returns False, writing nothing, when it has none of them.
+  with open(font_file, 'rb') as f:
+    data = f.read()
+  sfnt = read_sfnt_tables(data)
+  if sfnt is None:
+    return False
+  kept = [r for r in sfnt[1] if r[0].decode('latin-1') not in tags]
+  if len(kept) == len(sfnt[1]):
+    return False
+  with open(out_file, 'wb') as f:
+    f.write(build_sfnt(sfnt[0], [(tag, checksum, data[offset:offset + length]) for tag, checksum, offset, length in kept]))
+  return True
+
+def replace_font_tables(font_file, source_file, tags):
+  # replace the tables in tags of the sfnt font font_file with those of source_file. They
+  # keep their place in the file, the checksums and head.checkSumAdjustment are updated
+  with open(font_file, 'rb') as f:
+    data = f.read()
+  with open(source_file, 'rb') as f:
+    source = f.read()
+  sfnt_version, records = read_sfnt_tables(data)
+  source_records = dict((r[0], r) for r in read_sfnt_tables(source)[1])
+  tables = []
+  for tag, checksum, offset, length in sorted(records, key=lambda r: r[2]):
+    table = data[offset:offset + length]
+    if tag.decode('latin-1') in tags and tag in source_records:
+      offset, length = source_records[tag][2:]
+      table = source[offset:offset + length]
+      checksum = sfnt_checksum(table)
+    tables.append((tag, checksum, table))
+  data = bytearray(build_sfnt(sfnt_version, tables))
+  head = [r for r in read_sfnt_tables(data)[1] if r[0] == b'head']
+  if head:
+    data[head[0][2] + 8:head[0][2] + 12] = b'\0\0\0\0'
+    data[head[0][2] + 8:head[0][2] + 12] = struct.pack('>L', (0xb1b0afba - sfnt_checksum(bytes(data))) & 0xffffffff)
+  with open(font_file, 'wb') as f:
+    f.write(data)
+
+def convert_font(base_file, source_file, mapping, output_path, cmap, overwrite, optimize, use_ttfont, stream=False, verbose=True,
+                 dedupe=False, incremental=False, stats=None, base_binary=None):
+  # base_file and source_file must already be decompiled unless use_ttfont is set, returns stats.
+  # base_binary: font base_file was dumped from, the merged ttx is compiled on top of it
+  if stats is None:
+    stats = MergeStats()
+  cp_map = PRESET_MAP.get(mapping, {})
+  cmap_versions = get_cmap_versions(cmap)
+  if incremental:
+    if not use_ttfont or dedupe:
+      raise ValueError('incremental requires the fontTools module and cannot be used with dedupe or the ttx XML round-trip')
+    merge_font_incremental(base_file, source_file, cp_map, cmap_versions, overwrite, output_path, optimize, stats)
+    if verbose:
+      print('--------------------------------------------------')
+      if 'codes_patched' not in stats.counters:
+        print('Merged from scratch, wrote %s' % get_merge_manifest_path(output_path))
+      else:
+        print('Patched %d changed code points' % stats.counters['codes_patched'])
+    return stats
+  if use_ttfont:
+    # merge binary fonts in memory, without the ttx XML round-trip
+    merge_font_ttfont(base_file, source_file, cp_map, cmap_versions, overwrite, output_path, optimize, dedupe, stats)
+    if dedupe and verbose:
+      print('--------------------------------------------------')
+      print('Deduplicated glyphs: saved %d glyph IDs and %d bytes of glyf data' % (
+            stats.counters.get('glyphs_deduped', 0), stats.counters.get('glyf_bytes_deduped', 0)))
+    return stats
+  if dedupe:
+    raise ValueError('dedupe requires the fontTools module and cannot be used with the ttx XML round-trip')
+
+  output_filename, output_fileext = os.path.splitext(output_path)
+  if os.path.exists(output_filename + '.ttx'):
+    os.remove(output_filename + '.ttx')
+  if os.path.exists(output_filename + '.ttf'):
+    os.remove(output_filename + '.ttf')
+
+  # with more than one core, SPLIT_TABLES are compiled by a second ttx process at the same time
+  split_file = None
+  if base_binary and (os.cpu_count() or 1) > 1 and is_sfnt_font(base_binary):
+    split_file = output_filename + '.split.ttx'
+  merge = merge_font_streaming if stream else merge_font
+  merge(base_file, source_file, cp_map, cmap_versions, overwrite, output_filename + '.ttx', optimize, stats, split_file)
+
+  if verbose:
+    print('--------------------------------------------------')
+    print('Prepare for parsing output font file...')
+  stats.begin('compile', children=True)
+  # the per-glyph tables of base_binary would be copied as they are, stale once glyphs are written
+  glyphs_written = stats.counters.get('glyphs_replaced') or stats.counters.get('glyphs_appended')
+  stripped_file = output_filename + '.base' + os.path.splitext(base_binary or '')[1]
+  if base_binary and glyphs_written and strip_font_tables(base_binary, stripped_file, PER_GLYPH_TABLES):
+    base_binary = stripped_file
+  merge_args = '-m "%s" ' % base_binary if base_binary else ''
+  compiles = [(output_filename + '.ttx', output_path)]
+  if split_file:
+    compiles.append((split_file, output_filename + '.split' + output_fileext))
+  with ThreadPoolExecutor(max_workers=len(compiles)) as executor:
+    list(executor.map(lambda c: run_command('ttx %s%s-o "%s" "%s"' % ('' if verbose else '-q ', merge_args, c[1], c[0])), compiles))
+  if base_binary == stripped_file:
+    os.remove(stripped_file)
+  failed = [ttx_file for ttx_file, font_file in compiles if not os.path.exists(font_file)]
+  if split_file:
+    if not failed:
+      replace_font_tables(output_path, compiles[1][1], SPLIT_TABLES)
+    elif os.path.exists(output_path):
+      os.remove(output_path)  # its SPLIT_TABLES were copied from base_binary
+    for path in [split_file, compiles[1][1]]:
+      if os.path.exists(path):
+        os.remove(path)
+  stats.end()
+  if failed:
+    raise RuntimeError('ttx failed to compile %s' % failed[0])
+  return stats
+
+def load_manifest(manifest_file):
+  # A manifest is a list of jobs, or a table with a "jobs" list plus default
+  # values for all jobs. Relative paths are relative to the manifest file.
+  if os.path.splitext(manifest_file)[1].lower() == '.toml':
+    import tomllib  # Python 3.11+
+    with open(manifest_file, 'rb') as f:
+      manifest = tomllib.load(f)
+  else:
+    with open(manifest_file, encoding='utf-8') as f:
+      manifest = json.load(f)
+  if isinstance(manifest, list):
+    manifest = {'jobs': manifest}
+
+  defaults = dict((k, v) for k, v in manifest.items() if k != 'jobs')
+  manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+  jobs = []
+  for i, entry in enumerate(manifest.get('jobs', [])):
+    job = dict(defaults)
+    job.update(entry)
+    if 'base' not in job:
+      raise ValueError('job %d in %s has no base font' % (i + 1, manifest_file))
+    mapping = job.get('mapping')
+    if mapping is not None and mapping not in PRESET_MAP:
+      raise ValueError('job %d in %s has unknown mapping %s' % (i + 1, manifest_file, mapping))
+    cmap = job.get('cmap', '')
+    if isinstance(cmap, (list, tuple)):
+      cmap = ','.join(str(c) for c in cmap)
+    base = os.path.join(manifest_dir, job['base'])
+    output = job.get('output')
+    jobs.append({
+      'base': base,
+      'source': os.path.join(manifest_dir, job['source']) if job.get('source') else base,
+      'mapping': mapping,
+      'cmap': str(cmap),
+      'overwrite': bool(job.get('overwrite', False)),
+      'optimize': bool(job.get('optimize', False)),
+      'dedupe': bool(job.get('dedupe', False)),
+      'incremental': bool(job.get('incremental', False)),
+      'output': os.path.join(manifest_dir, output) if output else get_output_path(base, mapping),
+    })
+  return jobs
+
+def run_batch_job(job, use_ttfont, stream):
+  start = time.time()
+  try:
+    base_binary = job['base'] if job['base_file'] != job['base'] else None
+    convert_font(job['base_file'], job['source_file'], job['mapping'], job['output'], job['cmap'],
+                 job['overwrite'], job['optimize'], use_ttfont, stream, verbose=False, dedupe=job['dedupe'],
+                 incremental=job['incremental'], base_binary=base_binary)
+    return 'OK', time.time() - start, None
+  except Exception as e:
+    return 'FAILED', time.time() - start, '%s: %s' % (type(e).__name__, e)
+
+def run_batch(manifest_file, workers, use_ttfont, stream, cache=None):
+  jobs = load_manifest(manifest_file)
+  if not jobs:
+    print('No jobs in %s' % manifest_file)
+    return 0
+  workers = min(len(jobs), workers or os.cpu_count() or 1)
+  start = time.time()
+  results = [None] * len(jobs)
+
+  # jobs whose output is cached are done without decompiling anything
+  for i, job in enumerate(jobs):
+    job['cache_key'] = None
+    if cache is not None and not job['incremental'] and os.path.exists(job['base']) and os.path.exists(job['source']):
+      job['cache_key'] = get_output_cache_key(cache, job['base'], job['source'], job['mapping'], job['cmap'],
+                                              job['overwrite'], job['optimize'], job['dedupe'], job['output'], use_ttfont, stream)
+      if cache.fetch('output', job['cache_key'], os.path.splitext(job['output'])[1], job['output']):
+        results[i] = ('CACHED', 0, None)
+  pending = [i for i in range(len(jobs)) if results[i] is None]
+
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    # decompile each distinct input only once for all jobs using it
+    ttx_files = {}
+    if not use_ttfont and pending:
+      # .ttx inputs are used as they are, the dumps of the other fonts must not take their names
+      reserved = set(os.path.abspath(job[key]) for job in jobs for key in ('base', 'source')
+                     if os.path.splitext(job[key])[1].lower() == '.ttx')
+      for i in pending:
+        for font_file in (jobs[i]['base'], jobs[i]['source']):
+          if font_file not in ttx_files and os.path.splitext(font_file)[1].lower() != '.ttx':
+            ttx_file = os.path.splitext(font_file)[0] + '.ttx'
+            if os.path.abspath(ttx_file) in reserved:
+              # e.g. font.ttf and font.otf, or font.ttf and font.ttx in the same job list
+              ttx_file = font_file + '.ttx'
+            reserved.add(os.path.abspath(ttx_file))
+            ttx_files[font_file] = ttx_file
+      print('--------------------------------------------------')
+      print('Parsing %d input fonts to ttx with %d workers...' % (len(ttx_files), workers))
+      font_files = list(ttx_files)
+      list(executor.map(decompile_font, font_files, [ttx_files[f] for f in font_files],
+                        [True] * len(font_files), [cache] * len(font_files), [MERGED_TABLES] * len(font_files)))
+    for job in jobs:
+      job['base_file'] = ttx_files.get(job['base'], job['base'])
+      job['source_file'] = ttx_files.get(job['source'], job['source'])
+
+    print('--------------------------------------------------')
+    print('Running %d jobs with %d workers...' % (len(pending), workers))
+    futures = [executor.submit(run_batch_job, jobs[i], use_ttfont, stream) for i in pending]
+    for i, future in zip(pending, futures):
+      try:
+        results[i] = future.result()
+      except Exception as e:
+        # the worker process itself died
+        results[i] = ('FAILED', 0, '%s: %s' % (type(e).__name__, e))
+      if results[i][0] == 'OK' and jobs[i]['cache_key'] is not None:
+        cache.store('output', jobs[i]['cache_key'], os.path.splitext(jobs[i]['output'])[1], jobs[i]['output'])
+
+  failed = 0
+  print('--------------------------------------------------')
+  for job, (status, seconds, error) in zip(jobs, results):
+    if status == 'FAILED':
+      failed += 1
+    print('%-6s %7.1fs  %s' % (status, seconds, job['output']))
+    if error:
+      print('         %s' % error)
+  print('--------------------------------------------------')
+  print('Finished %d jobs (%d failed) in %.1fs' % (len(jobs), failed, time.time() - start))
+  return 1 if failed else 0
+
+
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(
     description='Merge TrueType fonts with Chinese Simplified/Traditional code point mapping, or convert font format.',
@@ -209,9 +1699,10 @@ Examples:
   %(prog)s "font.ttf" --mapping Hant2Hans                # Apply mapping
   %(prog)s "font.ttf" --mapping Hant2Hans -o "output.ttf"
   %(prog)s "base.ttf" -s "source.ttf" --mapping Hans -o "merged.ttf"
+  %(prog)s --batch "jobs.json"                           # Run all jobs of a manifest
 '''
   )
-  parser.add_argument('input', help='path to input font file')
+  parser.add_argument('input', nargs='?', help='path to input font file')
   parser.add_argument('-m', '--mapping', dest='mapping', choices=['Hans2Hant', 'Hant2Hans', 'Hans', 'Hant'],
                       help='code point mapping preset: Hans2Hant (Simplified->Traditional), Hant2Hans (Traditional->Simplified), Hans/Hant (copy glyphs). If not specified, no mapping is applied.', default=None)
   parser.add_argument('-o', '--output', dest='output_path', help='path to output font (default: <input>_<mapping>.ttf or <input>.ttf)', default=None)
@@ -219,15 +1710,37 @@ Examples:
   parser.add_argument('--cmap', help='cmap versions to update (default: all). Example: --cmap 4,12', default='')
   parser.add_argument('--overwrite', action='store_true', help='overwrite existing glyphs in base font')
   parser.add_argument('--optimize', action='store_true', help='optimize file size by removing empty glyphs from cmap')
+  parser.add_argument('--dedupe', action='store_true', help='map code points to one shared glyph instead of copying identical outlines (TrueType, in memory only)')
+  parser.add_argument('--incremental', action='store_true', help='patch only the code points changed since the last --incremental run into the existing output (in memory only)')
+  parser.add_argument('--xml', action='store_true', help='merge through the ttx XML round-trip instead of in memory (always used when fontTools cannot be imported)')
+  parser.add_argument('--stream', action='store_true', help='stream the ttx files table by table with bounded memory (implies --xml)')
+  parser.add_argument('--batch', metavar='MANIFEST', help='run all jobs listed in a JSON/TOML manifest instead of a single conversion')
+  parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes for --batch (default: number of cores)')
+  parser.add_argument('--no-cache', action='store_true', help='do not read or write the font cache')
+  parser.add_argument('--cache-dir', help='directory of the font cache (default: $XDG_CACHE_HOME/font-conv or ~/.cache/font-conv)', default=None)
+  parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024), help='maximum size of the font cache in MB (default: %(default)s)')
+  parser.add_argument('--profile', action='store_true', help='print the time and peak memory of each phase and merge counters when finished')
+  parser.add_argument('--profile-json', metavar='FILE', help='write the --profile report to a JSON file (implies --profile)', default=None)
+  parser.add_argument('--cprofile', metavar='FILE', help='write cProfile statistics of the run to FILE, for python -m pstats or snakeviz', default=None)
+  parser.add_argument('--progress', action='store_true', help='show the progress of the code point mapping loop')
   args = parser.parse_args()
 
-  # Generate default output path based on input filename
+  use_ttfont = TTFont is not None and not args.xml and not args.stream
+  cache = None if args.no_cache else FontCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+  if args.batch:
+    if args.profile or args.profile_json or args.cprofile or args.progress:
+      parser.error('--profile, --profile-json, --cprofile and --progress cannot be combined with --batch')
+    exit(run_batch(args.batch, args.jobs, use_ttfont, args.stream, cache))
+  if args.input is None:
+    parser.error('the following arguments are required: input (or --batch)')
+  if args.dedupe and not use_ttfont:
+    parser.error('--dedupe requires the fontTools module and cannot be combined with --xml or --stream')
+  if args.incremental and (not use_ttfont or args.dedupe):
+    parser.error('--incremental requires the fontTools module and cannot be combined with --dedupe, --xml or --stream')
+
   if args.output_path is None:
-    input_name, input_ext = os.path.splitext(args.input)
-    if args.mapping:
-      args.output_path = '%s_%s%s' % (input_name, args.mapping, input_ext if input_ext else '.ttf')
-    else:
-      args.output_path = '%s%s' % (input_name, '.ttf' if input_ext.lower() in ['.otf', '.ttx'] else input_ext if input_ext else '.ttf')
+    args.output_path = get_output_path(args.input, args.mapping)
 
   # If source_path is not specified, use input (single font conversion mode)
   if args.source_path is None:
@@ -242,50 +1755,53 @@ Examples:
     print('--------------------------------------------------')
     print('Merging glyphs from %s to %s' % (args.source_path, args.input))
 
-  base_filename, base_fileext = os.path.splitext(args.input)
-  if base_fileext.lower() != '.ttx':
-    print('--------------------------------------------------')
-    print('Parsing input font to ttx...')
-    if os.path.exists(base_filename + '.ttx'):
-      os.remove(base_filename + '.ttx')
-    os.system('ttx ' + args.input)
-
-  source_filename, source_fileext = os.path.splitext(args.source_path)
-  # Only parse source font if it's different from input font
-  if not is_same_source and source_fileext.lower() != '.ttx':
-    print('--------------------------------------------------')
-    print('Parsing source font to ttx...')
-    if os.path.exists(source_filename + '.ttx'):
-      os.remove(source_filename + '.ttx')
-    os.system('ttx ' + args.source_path)
+  # incremental outputs are patched in place and described by their sidecar, they are not cached
+  cache_key = None
+  if cache is not None and not args.incremental and os.path.exists(args.input) and os.path.exists(args.source_path):
+    cache_key = get_output_cache_key(cache, args.input, args.source_path, args.mapping, args.cmap, args.overwrite,
+                                     args.optimize, args.dedupe, args.output_path, use_ttfont, args.stream)
+    if cache.fetch('output', cache_key, os.path.splitext(args.output_path)[1], args.output_path):
+      print('--------------------------------------------------')
+      print('Finished with cached output file %s' % args.output_path)
+      exit(0)
+
+  stats = MergeStats(progress=args.progress)
+  profiler = None
+  if args.cprofile:
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+  base_file = args.input
+  source_file = args.source_path
+  if not use_ttfont:
+    # Only parse source font if it's different from input font
+    font_files = [args.input] if is_same_source else [args.input, args.source_path]
+    ttx_files = [os.path.splitext(f)[0] + '.ttx' for f in font_files]
+    if len(set(ttx_files)) < len(ttx_files):
+      # e.g. font.ttf and font.otf, or font.ttf and font.ttx which must not be overwritten
+      i = 0 if os.path.splitext(font_files[1])[1].lower() == '.ttx' else 1
+      ttx_files[i] = font_files[i] + '.ttx'
+    if any(os.path.splitext(f)[1].lower() != '.ttx' for f in font_files):
+      print('--------------------------------------------------')
+      print('Parsing %s to ttx...' % ('input font' if is_same_source else 'input and source fonts'))
+    stats.begin('decompile', children=True)
+    # ttx runs in child processes, so both fonts are dumped at the same time
+    with ThreadPoolExecutor(max_workers=len(font_files)) as executor:
+      ttx_files = list(executor.map(lambda f, t: decompile_font(f, t, cache=cache, tables=MERGED_TABLES), font_files, ttx_files))
+    stats.end()
+    base_file, source_file = ttx_files[0], ttx_files[-1]
 
   print('--------------------------------------------------')
   print('Prepare for merging font with code point map...')
-  output_filename, output_fileext = os.path.splitext(args.output_path)
-  if os.path.exists(output_filename + '.ttx'):
-    os.remove(output_filename + '.ttx')
-  if os.path.exists(output_filename + '.ttf'):
-    os.remove(output_filename + '.ttf')
-
-  cp_map = PRESET_MAP.get(args.mapping, {})
 
   # Check for problematic cmap formats (format 0 only supports 0-255)
   if args.cmap == '' and args.mapping:
-    base_ttx = base_filename + '.ttx'
     problematic_formats = []
     try:
-      import xml.etree.ElementTree as ET
-      tree = ET.parse(base_ttx)
-      root = tree.getroot()
-      cmap = root.find('cmap')
-      if cmap is not None:
-        for child in cmap:
-          if child.tag == 'cmap_format_0':
-            problematic_formats.append('0')
-          elif child.tag == 'cmap_format_2':
-            problematic_formats.append('2')
-          elif child.tag == 'cmap_format_6':
-            problematic_formats.append('6')
+      for cmap_format in get_cmap_formats(base_file):
+        if cmap_format in ['0', '2', '6'] and cmap_format not in problematic_formats:
+          problematic_formats.append(cmap_format)
       if problematic_formats:
         print('--------------------------------------------------')
         print('WARNING: Font contains cmap format(s) %s which only support limited character range.' % ', '.join(problematic_formats))
@@ -301,16 +1817,23 @@ Examples:
     except Exception as e:
       pass  # If check fails, continue anyway
 
-  if args.cmap == '':
-    cmap_versions = range(32)
-  else:
-    cmap_versions = args.cmap.split(',')
-
-  merge_font(base_filename + '.ttx', source_filename + '.ttx', cp_map, cmap_versions, args.overwrite, output_filename + '.ttx', args.optimize)
+  convert_font(base_file, source_file, args.mapping, args.output_path, args.cmap, args.overwrite, args.optimize, use_ttfont, args.stream,
+               dedupe=args.dedupe, incremental=args.incremental, stats=stats,
+               base_binary=args.input if base_file != args.input else None)
+  if cache_key is not None:
+    cache.store('output', cache_key, os.path.splitext(args.output_path)[1], args.output_path)
 
-  print('--------------------------------------------------')
-  print('Prepare for parsing output font file...')
-  os.system('ttx -o "%s" "%s"' % (args.output_path, output_filename + '.ttx'))
+  if profiler is not None:
+    profiler.disable()
+    profiler.dump_stats(args.cprofile)
+    print('--------------------------------------------------')
+    print('Wrote cProfile statistics to %s' % args.cprofile)
+  if args.profile or args.profile_json:
+    print('--------------------------------------------------')
+    print(stats.report())
+  if args.profile_json:
+    with open(args.profile_json, 'w', encoding='utf-8') as f:
+      json.dump(stats.to_dict(), f, indent=2)
 
   print('--------------------------------------------------')
   print('Finished with output file %s' % args.output_path)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+'''
+    File name: font_cache.py
+    Author: Emil Zhai
+    Python Version: 3.7
+'''
+
+import hashlib, os, shutil, tempfile
+
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+
+def file_hash(path):
+  h = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+      h.update(chunk)
+  return h.hexdigest()
+
+def get_default_cache_dir():
+  cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(cache_home, 'font-conv')
+
+class FontCache(object):
+  # Content addressed file cache, entries are stored as <cache_dir>/<kind>/<key><ext>
+  # and evicted in least recently used order once the cache exceeds max_size bytes.
+
+  def __init__(self, cache_dir=None, max_size=DEFAULT_CACHE_SIZE):
+    self.cache_dir = cache_dir or get_default_cache_dir()
+    self.max_size = max_size
+    self.file_hashes = {}
+
+  def file_hash(self, path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key not in self.file_hashes:
+      self.file_hashes[memo_key] = file_hash(path)
+    return self.file_hashes[memo_key]
+
+  def make_key(self, *parts):
+    return hashlib.sha256('\0'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+  def get_path(self, kind, key, ext):
+    return os.path.join(self.cache_dir, kind, key + ext)
+
+  def fetch(self, kind, key, ext, out_file):
+    # copy a cached entry to out_file, returns False on cache miss
+    path = self.get_path(kind, key, ext)
+    try:
+      shutil.copyfile(path, out_file)
+      os.utime(path, None)
+    except (IOError, OSError):
+      return False
+    return True
+
+  def store(self, kind, key, ext, src_file):
+    path = self.get_path(kind, key, ext)
+    try:
+      if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+      # write to a temporary file first, so concurrent readers never see partial entries
+      fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+      os.close(fd)
+      shutil.copyfile(src_file, tmp_path)
+      os.replace(tmp_path, path)
+    except (IOError, OSError):
+      return False
+    self.evict()
+    return True
+
+  def evict(self):
+    entries = []
+    total = 0
+    for root, dirs, files in os.walk(self.cache_dir):
+      for name in files:
+        path = os.path.join(root, name)
+        try:
+          stat = os.stat(path)
+        except OSError:
+          continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    entries.sort()
+    for mtime, size, path in entries:
+      if total <= self.max_size:
+        break
+      try:
+        os.remove(path)
+        total -= size
+      except OSError:
+        pass
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+'''
+    File name: merge_stats.py
+    Author: Emil Zhai
+    Python Version: 3.7
+'''
+
+import os, subprocess, sys, tempfile, threading, time
+
+try:
+  import resource
+except ImportError:
+  resource = None  # peak RSS is not available on Windows
+
+# seconds between two updates of the progress line
+PROGRESS_INTERVAL = 0.2
+
+# largest peak RSS of the commands run by run_command since the last child phase began
+child_peak_rss = [None]
+child_peak_lock = threading.Lock()
+
+# runs argv[1] with the shell and writes its ru_maxrss to argv[2]. A child's peak RSS
+# includes the memory of the process it was forked from, so this small process starts it
+RUN_COMMAND = '''
+import os, subprocess, sys
+process = subprocess.Popen(sys.argv[1], shell=True)
+status, usage = os.wait4(process.pid, 0)[1:]
+process.returncode = status
+with open(sys.argv[2], 'w') as f:
+  f.write(str(usage.ru_maxrss))
+sys.exit(os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1)
+'''
+
+def maxrss_bytes(maxrss):
+  return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def reset_peak_rss():
+  # Linux can reset the peak RSS of this process, returns False where it cannot
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+    return True
+  except (IOError, OSError):
+    return False
+
+def get_peak_rss():
+  # peak resident set size of this process in bytes, since the last reset_peak_rss on Linux
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1]) * 1024
+  except (IOError, OSError):
+    pass
+  if resource is None:
+    return None
+  return maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def run_command(command):
+  # like os.system, but also records the peak RSS of the command for the child phase
+  # running it, RUSAGE_CHILDREN only has the peak of all children ever waited for
+  if not hasattr(os, 'wait4'):
+    return os.system(command)
+  fd, rss_file = tempfile.mkstemp()
+  os.close(fd)
+  try:
+    status = subprocess.call([sys.executable, '-c', RUN_COMMAND, command, rss_file])
+    with open(rss_file) as f:
+      maxrss = f.read()
+  finally:
+    os.remove(rss_file)
+  if maxrss:
+    with child_peak_lock:
+      child_peak_rss[0] = max(child_peak_rss[0] or 0, maxrss_bytes(int(maxrss)))
+  return status
+
+class MergeStats(object):
+  # Wall time and peak RSS of each merge phase plus event counters, returned by the
+  # merge functions. Phases run more than once, e.g. decompiling two fonts, add up.
+  # The peak RSS is that of the phase itself where the platform can reset it, else
+  # only phases which raise the peak of the whole process report it.
+
+  def __init__(self, progress=False):
+    self.phases = {}
+    self.counters = {}
+    self.show_progress = progress
+    self.current = None
+
+  def begin(self, name, children=False):
+    # end the current phase and start the next one, children: the phase runs its
+    # work in child processes with run_command, whose largest peak RSS is reported instead
+    self.end()
+    start_rss = None
+    if children:
+      with child_peak_lock:
+        child_peak_rss[0] = None
+    elif not reset_peak_rss():
+      start_rss = get_peak_rss()
+    self.current = (name, children, start_rss, time.perf_counter())
+
+  def end(self):
+    if self.current is None:
+      return
+    name, children, start_rss, start = self.current
+    self.current = None
+    stats = self.phases.setdefault(name, {'seconds': 0.0, 'peak_rss': None, 'calls': 0})
+    stats['seconds'] += time.perf_counter() - start
+    stats['calls'] += 1
+    peak_rss = child_peak_rss[0] if children else get_peak_rss()
+    if start_rss is not None and peak_rss is not None and peak_rss <= start_rss:
+      peak_rss = None  # an earlier phase set the peak, this one is not known
+    if peak_rss is not None:
+      stats['peak_rss'] = max(stats['peak_rss'] or 0, peak_rss)
+
+  def count(self, name, n=1):
+    self.counters[name] = self.counters.get(name, 0) + n
+
+  def progress(self, items, label):
+    # iterate items, showing a live progress line on stderr if enabled
+    if not self.show_progress:
+      return items
+    return self.iter_progress(items, label)
+
+  def iter_progress(self, items, label):
+    total = len(items)
+    last = 0
+    for i, item in enumerate(items):
+      now = time.perf_counter()
+      if now - last >= PROGRESS_INTERVAL:
+        last = now
+        sys.stderr.write('\r%s: %d/%d (%d%%)' % (label, i, total, i * 100 // max(total, 1)))
+        sys.stderr.flush()
+      yield item
+    sys.stderr.write('\r%s: %d/%d (100%%)\n' % (label, total, total))
+    sys.stderr.flush()
+
+  def to_dict(self):
+    return {'phases': self.phases, 'counters': self.counters}
+
+  def report(self):
+    lines = ['%-12s %10s %8s %14s' % ('phase', 'time (s)', 'calls', 'peak RSS (MB)')]
+    for name, stats in self.phases.items():
+      peak_rss = '-' if stats['peak_rss'] is None else '%.1f' % (stats['peak_rss'] / (1024.0 * 1024.0))
+      lines.append('%-12s %10.3f %8d %14s' % (name, stats['seconds'], stats['calls'], peak_rss))
+    lines.append('%-12s %10.3f' % ('total', sum(s['seconds'] for s in self.phases.values())))
+    if self.counters:
+      lines.append('')
+      for name in sorted(self.counters):
+        lines.append('%-24s %10d' % (name, self.counters[name]))
+    return '\n'.join(lines)